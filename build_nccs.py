@@ -14,7 +14,7 @@ class BuildNCCS():
     This is the top-level class.  It initializes the other classes of the program and holds the methods
     related to logging.
     """
-    def __init__(self, path, current_yr=None, force_new_download=False, forms=['PF', 'EZ', 'Full'], backfill=2, tolerance=1000, do_validation=True, clear_old=True, partial_validation=True, get_from_sql=True, output_full=True):
+    def __init__(self, path, current_yr=None, force_new_download=False, forms=['PF', 'EZ', 'Full'], backfill=2, tolerance=1000, do_validation=True, clear_old=True, partial_validation=True, get_from_sql=True, output_full=True, parser_engine='c', sql_cache_bytes=None, sql_backend='mysql'):
 
         forms = [f.upper() for f in forms]
         self.forms = ['Full' if f == 'FULL' else f for f in forms]
@@ -23,7 +23,7 @@ class BuildNCCS():
 
         self.logger, self.start = self.start_logging(path, current_yr)
 
-        self.data     = data.Data(self, clear_old, get_from_sql, current_yr, backfill)
+        self.data     = data.Data(self, clear_old, get_from_sql, current_yr, backfill, parser_engine, sql_cache_bytes, sql_backend)
         self.process  = process.Process(self)
         self.validate = validate.Validate(self, tolerance, do_validation, partial_validation)
         self.write    = write.Write(self, output_full)
@@ -76,11 +76,16 @@ nccs.data_dict : dictionary of {form: dataframe} where form is EZ, Full or PF, b
 nccs.data.core_file_year  : int of the year processed
 nccs.data.backfilled      : nested dictionary of {form: {year: list of EINs used in backfilling}}
 nccs.data.crosswalks      : nested dictionary of {form: {IRS column name: NCCS column name}}
+nccs.data.source_columns  : dictionary of {form: list of every column in the IRS file, including any not read}
+nccs.data.planned_columns : set of the column names the build uses, which limits the IRS columns that are read
+nccs.data.ingest_schema   : nested dictionary of {form: {IRS column name: 'numeric' or 'str'}} used when reading the IRS files
 nccs.data.droplists       : dictionary of {form: list of columns to check for zero-filer status}
 nccs.data.dropped_columns : dictionary of {form: list of columns dropped before writing to file}
 nccs.data.missing_columns : dictionary of {form: list of columns expected but not found when writing to file}
 nccs.data.numeric_columns : list of columns forced to be numeric
-nccs.data.sql_cache       : dictionary of {filename: dataframe downloaded from SQL}
+nccs.data.sql_cache       : cache of {filename: dataframe downloaded from SQL}; see sql_cache.stats() for its hits, misses and evictions
+nccs.data.sql_pool        : pool of MySQL connections used to fetch prior releases at the same time
+nccs.data.sql_store       : the data store get_sql queries, MySQLBackend or (if sql_backend is "sqlite") SQLiteBackend
 
 nccs.write.data_dict : dictionary of {form: dataframe} where form is CO, PC, PF, CO_full or PC_full.  Final versions written to file.
 
@@ -61,13 +61,24 @@ class BMFShare():
         RETURNS
         None
         """
-        main = self.main
+        bmf, bmf_cols = self.bmf_data()
+        self.bmf_create(bmf, bmf_cols)
+
+    def bmf_data(self):
+        """
+        The loading half of the bmf method: downloads the raw BMF data and rearranges its columns.
+
+        ARGUMENTS
+        None
 
+        RETURNS
+        (DataFrame, list) : The BMF data, and the lists of its columns for all forms, CO/PC and PF
+        """
         all_cols = ['ORGANIZATION', 'ZIP', 'ACTIVITY', 'AFFILIATION', 'DEDUCTIBILITY', 'ICO', 'SORT_NAME', 'FILING_REQ_CD', 'PF_FILING_REQ_CD']
         pf_cols = ['ASSET_CD', 'INCOME_CD']
         copc_cols = ['STATUS']
 
-        bmf = self.download_bmf()
+        bmf = self.download_bmf(eins=self.bmf_eins())
 
         #bmf = bmf[all_cols+pf_cols+copc_cols]#.copy(deep=True) #moved to bmf_create method
 
@@ -86,7 +97,20 @@ class BMFShare():
 
         bmf_cols = [all_cols, copc_cols, pf_cols]
 
-        self.bmf_create(bmf, bmf_cols)
+        return bmf, bmf_cols
+
+    def bmf_eins(self):
+        """
+        Returns the EINs to keep from the BMF as it is read, or None to keep all of them.  Every EIN is kept
+        here; the Data class overrides this to keep only the EINs in the core files it merges the BMF into.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        return None
 
     def bmf_create(self, bmf, bmf_cols):
         """
@@ -129,6 +153,19 @@ class BMFShare():
         RETURNS
         None
         """
+        fipsmsa, cols = self.fipsmsa_data()
+        self.fipsmsa_create(fipsmsa, cols)
+
+    def fipsmsa_data(self):
+        """
+        The loading half of the fipsmsa method.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        (DataFrame, list) : The lu_fipsmsa data, and its columns
+        """
         main = self.main
 
         cols = ['FIPS', 'PMSA', 'MSA_NECH']
@@ -138,7 +175,7 @@ class BMFShare():
 
         main.logger.info('    done.')
 
-        self.fipsmsa_create(fipsmsa, cols)
+        return fipsmsa, cols
 
     def fipsmsa_create(self, fipsmsa, fipsmsa_cols):
         """
@@ -172,6 +209,18 @@ class BMFShare():
         RETURNS
         None
         """
+        self.ntee_create(self.ntee_data())
+
+    def ntee_data(self):
+        """
+        The loading half of the ntee method.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        DataFrame : The nteedocAllEins data, indexed by EIN
+        """
         main = self.main
 
         #removed Activ1 due to now coming from BMF downloads
@@ -181,14 +230,28 @@ class BMFShare():
                 'censusTract', 'block']
 
         main.logger.info('Loading master NTEE data from NCCS MySQL server...')
+        ntee = self.load_ntee(cols)
+        main.logger.info('    done.')
+
+        return ntee
+
+    def load_ntee(self, cols):
+        """
+        Retrieves the specified columns of nteedocAllEins; get_sql cleans the hyphens out of its EIN index as it
+        converts the EINs to integers.  The Data class overrides this to look the EINs up in the NTEEStore
+        instead, where it can.
+
+        ARGUMENTS
+        cols (list) : Columns of nteedocAllEins to retrieve
+
+        RETURNS
+        DataFrame
+        """
         ntee = self.get_sql('nteedocAllEins', 'nccs', cols=cols, force_sql_cols=True)
 
-        ntee.index = ntee.index.str.replace('-', '') #EIN column has some hyphens
         # ntee.set_index('EIN', inplace=True)
         # ntee.columns = [col.upper() for col in ntee.columns.values] #make all columns upper case
-        main.logger.info('    done.')
-
-        self.ntee_create(ntee)
+        return ntee
 
     def ntee_create(self, ntee):
         """
@@ -222,26 +285,63 @@ class Data(LoadData, BMFShare):
     holds Data methods that are needed for inheritance into both this class and the NCCS BMF creation process, and
     the LoadData class holds methods that specifically involve loading data from the internet, SQL or from file.
     """
-    def __init__(self, main, clear_old, get_from_sql, current_yr, backfill):
+    def __init__(self, main, clear_old, get_from_sql, current_yr, backfill, parser_engine='c', sql_cache_bytes=None, sql_backend='mysql'):
+        assert(parser_engine in ['c', 'pyarrow']), 'parser_engine must be "c" or "pyarrow".'
+        assert(sql_backend in ['mysql', 'sqlite']), 'sql_backend must be "mysql" or "sqlite".'
+        assert(parser_engine != 'pyarrow' or pa is not None), 'The pyarrow parser_engine requires the pyarrow package.'
         self.main = main
         if main is not None: #small exception so the validation fixer tool can create a temp instance to get at the numeric_columns values
             self.irs_download_folder = check_folder(main.path, os.path.join('downloads', 'IRS'))
             self.nccs_download_folder = check_folder(main.path, os.path.join('downloads', 'NCCS'))
+            self.manifest = DownloadManifest(os.path.join(main.path, 'downloads', 'irs_manifest.json'))
+            self.parse_cache = ParseCache(os.path.join(main.path, check_folder(main.path, os.path.join('downloads', 'parsed'))))
+            self.nccs_mirror = ParseCache(os.path.join(main.path, self.nccs_download_folder), 'mirror_index.json')
+            self.ntee_store = NTEEStore(os.path.join(main.path, 'downloads', 'ntee'))
         self.headers = {'user-agent': 'National Center for Charitable Statistics, Data Retrieval Tool (jlevy@urban.org)'}
         self.irs_delim = ' '
         self.epostcard_delim = '|'
         self.bmf_delim = ','
+        self.download_chunk_size = 1024*1024 #bytes written to disk at a time when streaming downloads
+        self.download_timeout = 60 #seconds to wait on the IRS server before giving up on a download
+        self.download_workers = 4 #number of IRS downloads allowed to run at the same time
+        self.downloads = DownloadManager(self, self.download_workers)
+        self.parser_engine = parser_engine #'c' for the single-threaded pandas parser, 'pyarrow' for the multithreaded pyarrow one
+        self.pipeline_parse = True #if True, core files are parsed in chunks while they are still downloading
+        self.parse_chunksize = 100000 #rows per chunk when parsing a core file during its download
+        self.cache_parsed = True #if True (and pyarrow is installed), parsed core files are kept in "downloads/parsed" and reused while unchanged
+        self.epostcard_index = False #if True (and pyarrow is installed), the EINs and years from the epostcard data are kept in "downloads/parsed" between runs
+        self.project_columns = True #if True, only the IRS columns the build actually uses are read from the core files
+        self.ntee_lookup = True #if True (and pyarrow is installed), NTEE rows are looked up by EIN in a store in "downloads/ntee", rebuilt when nteedocAllEins changes
         self.clear_old = clear_old #if True, deletes old dataframes from memory after backfill
+        self.check_joins = False #if True, enrich also merges the lookup tables the slow way and asserts the results are identical
+        self.categorical_codes = True #if True, the code_columns are held as pandas categoricals from build_output until written to file
+        self.sparse_density = 0.1 #numeric columns with no more than this share of non-zero values are held as sparse columns; None keeps them all dense
+        self.arrow_strings = False #if True (and pyarrow is installed), the text_columns are held as Arrow-backed strings from make_numeric until written to file
 
         self.get_from_sql = get_from_sql #if True, will attempt to connect to the NCCS data store and download ntee and fipsmsa
+        self.sql_backend = sql_backend #'mysql' for the NCCS MySQL server; 'sqlite' for a local stand-in loaded from the tables in downloads/nccs
+        self.sql_store = None #the MySQLBackend or SQLiteBackend, set in sql_auth
         self.sql_server_name = 'uiresearchrds.urban.org'
         self.sql_connection = None
-        self.sql_cache = {} #stores dataframes retrieved from sql
+        self.sql_workers = 4 #number of MySQL connections used to fetch prior releases at the same time
+        self.sql_pool = None
+        self.sql_cache_bytes = sql_cache_bytes #memory budget for the dataframes retrieved from sql; None keeps all of them
+        spill_path = None if main is None else os.path.join(main.path, 'downloads', 'sql_spill')
+        self.sql_cache = SQLCache(sql_cache_bytes, spill_path, self.sql_on_disk) #stores dataframes retrieved from sql
+        self.sql_partial = set() #names of tables cached under their own name with only some of their columns
+        self.sql_write_through = True #if True, tables retrieved from MySQL are retrieved whole and saved to downloads/nccs, so later runs (and the sqlite sql_backend) need no MySQL
+        self.sql_semijoin = True #if True (and sql_write_through is off, or the data store is local), prior releases are filtered to the EINs that can be used in MySQL
+        self.sql_ein_table = 'nccs_build_eins' #name of the temporary table of EINs used for that filtering
+        self.sql_chunksize = 100000 #rows fetched at a time from MySQL on a server-side cursor; None fetches each table in one piece
+        self.sql_mirror = True #if True (and pyarrow is installed), tables kept in downloads/nccs are saved as Parquet instead of CSV, and CSV files there are converted on first use
 
         self.data_dict  = {}
         self.prior_year_df = {}
         self.droplists  = {}
         self.crosswalks = {}
+        self.ingest_schema = {}
+        self.source_columns = {}
+        self.planned_columns = None
         self.backfilled = {}
         self.not_crosswalked = {}
         self.dropped_columns = {}
@@ -270,6 +370,192 @@ class Data(LoadData, BMFShare):
             'P14PSUPA','P14PSUPB','P14PSUPC','P14PSUPD','P14TGINV','P14GINVA','P14GINVB','P14GINVC','P14GINVD','P2TINVSC','P2GVTINV','P2CRPSTK','P2CRPBND',
             'TOTREVP', 'EXPSP', 'ASS_BOY']
 
+        #low-cardinality string columns; see encode_codes
+        self.code_columns = ['SUBSECCD', 'FNDNCD', 'STATE', 'SOURCE', 'NTEEFINAL', 'LEVEL1', 'LEVEL2', 'LEVEL3', 'LEVEL4',
+            'NTMAJ10', 'NTMAJ12', 'NTMAJ5', 'MAJGRPB', 'FRCD', 'ACTIV1', 'ACTIV2', 'ACTIV3', 'EOSTATUS', 'INPRIOR']
+
+        #free-text string columns; see arrow_text
+        self.text_columns = ['NAME', 'SEC_NAME', 'ADDRESS', 'CITY', 'CONTACT', 'FILENAME', 'NCCSKEY', 'NCCSKEY2']
+
+    def encode_codes(self, frames):
+        """
+        Stores the code_columns of the specified dataframes as pandas categoricals: each distinct code is held
+        once, and every row only holds a small integer, rather than a string object per row.  Each column gets
+        the same sorted set of categories in every dataframe, so pd.concat keeps it categorical instead of
+        falling back to object.  Values are unchanged, and are written out as before by to_csv.
+
+        A column is only encoded if all of its values are strings, and if it has fewer distinct values than half
+        the rows of an average dataframe (otherwise the categories would take more memory than they save).
+        Codes that arrive later (e.g. with data from a prior release) make it object again until this is run
+        on it once more.
+
+        ARGUMENTS
+        frames (dict) : {form: DataFrame}, encoded in place
+
+        RETURNS
+        None
+        """
+        if not self.categorical_codes:
+            return
+        for col in self.code_columns:
+            dfs = [df for df in frames.values() if col in df.columns]
+            values = set()
+            for df in dfs:
+                if df[col].dtype.name == 'category':
+                    values.update(df[col].cat.categories)
+                elif pd.api.types.infer_dtype(df[col], skipna=True) in ['string', 'empty']:
+                    values.update(df[col].dropna().unique())
+                else:
+                    values = None
+                    break
+            if values is None or len(dfs) == 0 or 2*len(values)*len(dfs) > sum([len(df) for df in dfs]):
+                continue
+            dtype = pd.api.types.CategoricalDtype(sorted(values))
+            for df in dfs:
+                if df[col].dtype != dtype:
+                    df[col] = df[col].astype(dtype)
+
+    def sparsify(self, frames):
+        """
+        Stores the mostly-zero numeric_columns of the specified dataframes as sparse columns, which only hold
+        their non-zero values.  A column is made sparse when its share of non-zero values is no more than
+        sparse_density; each form is decided on its own.  Columns that are all zero are left dense, as pandas
+        fills a sparse column with no non-zero values with NaN when it is reindexed, e.g. by a left merge.
+
+        ARGUMENTS
+        frames (dict) : {form: DataFrame}, changed in place
+
+        RETURNS
+        None
+        """
+        if self.sparse_density is None:
+            return
+        for form, df in frames.items():
+            sparse = []
+            for col in [c for c in df.columns if c in self.numeric_columns]:
+                values = df[col].values
+                if isinstance(df[col].dtype, pd.SparseDtype):
+                    sparse.append(col)
+                elif isinstance(values, np.ndarray) and values.dtype.type in [np.float64, np.int64] and \
+                   0 < np.count_nonzero(values) <= self.sparse_density*len(values):
+                    df[col] = df[col].astype(pd.SparseDtype(values.dtype, 0))
+                    sparse.append(col)
+            self.main.logger.info('Holding {} mostly-zero columns of {} as sparse.'.format(len(sparse), form))
+
+    def arrow_text(self, frames):
+        """
+        Stores the text_columns of the specified dataframes as Arrow-backed strings, which keep the characters
+        of a whole column in one buffer instead of a Python string object per row, and are concatenated by
+        joining buffers.  Missing values become pd.NA, which to_csv writes out as blanks, as it does NaN.
+
+        A column is only converted if all of its values are strings, whether it is held as objects or in pandas'
+        own str dtype (the default for strings from pandas 3).  Rows that arrive later as objects (e.g. with data
+        from a prior release) make the column object again until this is run on it once more.
+
+        ARGUMENTS
+        frames (dict) : {form: DataFrame}, converted in place
+
+        RETURNS
+        None
+        """
+        if not self.arrow_strings or pa is None:
+            return
+        dtype = pd.StringDtype('pyarrow')
+        for df in frames.values():
+            for col in [c for c in self.text_columns if c in df.columns]:
+                if df[col].dtype != dtype and pd.api.types.is_string_dtype(df[col].dtype) and \
+                   pd.api.types.infer_dtype(df[col], skipna=True) in ['string', 'empty']:
+                    df[col] = df[col].astype(dtype)
+
+    def decode_codes(self, df):
+        """
+        Turns the columns converted by encode_codes (categoricals) or arrow_text (Arrow-backed strings, with pd.NA
+        for missing values) back into object columns, e.g. before assigning values that may not be among the
+        categories, or rows of values (which pandas can't yet assign into Arrow-backed columns).  Other string
+        columns, such as those of pandas' own str dtype, are left as they are.
+
+        ARGUMENTS
+        df (DataFrame) : Data encoded by encode_codes or arrow_text
+
+        RETURNS
+        DataFrame
+        """
+        arrow = pd.StringDtype('pyarrow') if pa is not None else None
+        for col in df.columns:
+            if (col in self.code_columns and df[col].dtype.name == 'category') or \
+               (col in self.text_columns and df[col].dtype == arrow):
+                df[col] = df[col].astype(object)
+        return df
+
+    def densify(self, df):
+        """
+        Turns any sparse columns of a dataframe back into dense ones, e.g. before writing it to file, so zeros
+        are written out as they would be from a dense column.
+
+        ARGUMENTS
+        df (DataFrame) : Data with columns made sparse by sparsify
+
+        RETURNS
+        DataFrame
+        """
+        for col in [c for c in df.columns if isinstance(df[c].dtype, pd.SparseDtype)]:
+            df[col] = df[col].sparse.to_dense()
+        return df
+
+    def bmf_eins(self):
+        """
+        Overrides the BMFShare method so the BMF is filtered down to the EINs in the core files while it is
+        read, since bmf_create only left-joins the BMF onto those EINs anyway.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        Index : The EINs in all of the forms in nccs.data_dict
+        """
+        main = self.main
+        eins = main.data_dict[main.forms[0]].index
+        for form in main.forms[1:]:
+            eins = eins.union(main.data_dict[form].index)
+        return eins
+
+    def load_ntee(self, cols):
+        """
+        Overrides the BMFShare method to use the NTEEStore in "downloads/ntee": if it was built from the current
+        version of nteedocAllEins (see sql_table_version) with the same columns, only the rows for the EINs in
+        the core files are taken from it.  Otherwise the table is loaded as usual and the store is rebuilt first.
+        Without pyarrow, or with the ntee_lookup setting off, the BMFShare method is used as is.
+
+        ARGUMENTS
+        cols (list) : Columns of nteedocAllEins to retrieve
+
+        RETURNS
+        DataFrame : The NTEE rows for the EINs in nccs.data_dict
+        """
+        main = self.main
+        if not self.ntee_lookup or not self.ntee_store.available:
+            return BMFShare.load_ntee(self, cols)
+
+        def _version():
+            version = self.sql_table_version('nteedocAllEins', 'nccs')
+            return None if version is None else version + '|' + ','.join(cols)
+
+        if not self.ntee_store.current(_version()):
+            ntee = BMFShare.load_ntee(self, cols)
+            version = _version() #loading may have just saved the table to downloads/nccs, which changes its version
+            if version is None:
+                return ntee
+            main.logger.info('    building the NTEE lookup store from {} rows...'.format(len(ntee)))
+            try:
+                self.ntee_store.build(ntee, version)
+            except pa.ArrowException as e:
+                main.logger.info('    could not build the NTEE lookup store ({}).'.format(e))
+                return ntee
+
+        ntee = self.ntee_store.lookup(self.bmf_eins())
+        main.logger.info('    looked up {} rows in the NTEE store of {} rows.'.format(len(ntee), self.ntee_store.meta['rows']))
+        return ntee
+
     def apply_crosswalk(self):
         """
         Crosswalks the IRS data with the NCCS variable names.  The crosswalks are retrieved from the "settings/crosswalk" folder.
@@ -286,19 +572,7 @@ class Data(LoadData, BMFShare):
 
         for form in main.forms:
             self.not_crosswalked[form] = {}
-
-            header_file = os.path.join(main.path, 'settings', 'crosswalk', '{}.txt'.format(form.lower()))
-            xwalks[form] = {}
-
-            with open(header_file, 'r') as f:
-                _ = f.readline() #discard headers
-                for line in f:
-                    nccs, irs = line.split(',')
-                    irs = irs.strip().upper()
-                    nccs = nccs.strip()
-                    xwalks[form][irs] = nccs
-                if 'EIN' in xwalks[form].keys():
-                    del xwalks[form]['EIN'] #EIN is set as the index, and thus not treated as a column
+            xwalks[form] = self.load_crosswalk(form)
 
             df = data_dict[form]
 
@@ -313,19 +587,136 @@ class Data(LoadData, BMFShare):
             old_vals = df.columns.values
             old_vals = [v.upper() for v in old_vals]
             df.columns = old_vals
-
             df.rename(columns=xwalks[form], inplace=True)
-            changes = len(set(old_vals).difference(df.columns.values))
+
+            #the counts are taken from the full header of the IRS file, since unused columns may not have been read at all
+            source_vals = [c.upper() for c in self.source_columns.get(form, old_vals)]
+            new_vals = [xwalks[form].get(c, c) for c in source_vals]
+            changes = len(set(source_vals).difference(new_vals))
             main.logger.info('Crosswalk applied to {} {}.  There were {} changes out of {} columns.'.
-                  format(form, self.core_file_year, changes, len(old_vals)))
+                  format(form, self.core_file_year, changes, len(source_vals)))
 
-            missing = [c for c in xwalks[form].values() if c not in df.columns]
+            missing = [c for c in xwalks[form].values() if c not in new_vals]
             self.not_crosswalked[form][self.core_file_year] = missing
             if len(missing) > 0:
                 main.logger.info('WARNING: {} columns failed to crosswalk; see nccs.data.not_crosswalked["{}"]["{}"] for details.'.format(len(missing), form, self.core_file_year))
 
         main.logger.info('All crosswalks applied.\n')
 
+    def load_crosswalk(self, form):
+        """
+        Reads the crosswalk between IRS and NCCS column names for one form from the "settings/crosswalk" folder.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+
+        RETURNS
+        dict : {IRS column name (upper case): NCCS column name}
+        """
+        xwalk = {}
+        header_file = os.path.join(self.main.path, 'settings', 'crosswalk', '{}.txt'.format(form.lower()))
+        with open(header_file, 'r') as f:
+            _ = f.readline() #discard headers
+            for line in f:
+                nccs, irs = line.split(',')
+                irs = irs.strip().upper()
+                nccs = nccs.strip()
+                xwalk[irs] = nccs
+        if 'EIN' in xwalk.keys():
+            del xwalk['EIN'] #EIN is set as the index, and thus not treated as a column
+        return xwalk
+
+    def ingest_dtypes(self, form, columns):
+        """
+        Builds the schema used to read an IRS core file, from the crosswalk for that form and the list of
+        numeric columns.  Any IRS column that crosswalks to (or is already named) one of numeric_columns is
+        left out of the returned dtypes, so the CSV parser converts it straight to int64 or float64 as it
+        reads; everything else, including the EIN and all of the code columns, is read as a string.  So are
+        the columns in the "drop if missing" list of the form, since drop_missing compares their text with
+        '0' and 'N' (e.g. '00' or '0.00' is not a zero filer there, though it would be as a number).
+
+        A numeric column holding anything that isn't a number is still read as strings by the parser, and
+        is then coerced by the make_numeric method the same as before.  The schema for each form is kept in
+        nccs.data.ingest_schema.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        columns (list) : The column names in the header of the IRS file
+
+        RETURNS
+        dict : {IRS column name: 'str'} for every column that should not be parsed as a number
+        """
+        xwalk = self.load_crosswalk(form)
+        numeric = set(self.numeric_columns).difference(self.load_droplist(form, xwalk))
+
+        schema = {}
+        for col in columns:
+            nccs = xwalk.get(col.upper(), col.upper())
+            schema[col] = 'numeric' if nccs in numeric else 'str'
+        self.ingest_schema[form] = schema
+
+        return {col:dtype for col, dtype in schema.items() if dtype == 'str'}
+
+    def plan_columns(self):
+        """
+        Works out which NCCS columns the build actually uses, so that the IRS columns that would only be
+        dropped again by check_columns are never read in the first place.  A column is needed if it is in
+        one of the "final variable lists", in one of the "drop if missing" lists, or in one of the "build
+        columns" lists, which name every column the process, validate and write steps refer to (calculations,
+        validation equations, the validation fixer's column groups, and duplicate criteria).  Any code that
+        starts using a new column must add it to the "build columns" list for its step.
+
+        Every NCCS name in the crosswalks must be among them, as the crosswalk steps (e.g. the check for a
+        single TAXPER column) expect those columns to have been read.
+
+        The result is computed once and kept in nccs.data.planned_columns.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        set : Column names, in upper case
+        """
+        if self.planned_columns is not None:
+            return self.planned_columns
+
+        path = self.main.path
+        planned = {'EIN'}
+
+        for folder in ['final variable lists', 'drop if missing', 'build columns']:
+            folder_path = os.path.join(path, 'settings', folder)
+            for fname in os.listdir(folder_path):
+                if fname.endswith('.txt'):
+                    with open(os.path.join(folder_path, fname), 'r') as f:
+                        planned.update([line.strip().upper() for line in f if line.strip()])
+
+        for fname in os.listdir(os.path.join(path, 'settings', 'crosswalk')):
+            if fname.endswith('.txt'):
+                missing = sorted(set(self.load_crosswalk(fname[:-4]).values()).difference(planned))
+                assert(len(missing) == 0), 'Crosswalked columns {} in {} are not in any list in "settings/build columns".'.format(missing, fname)
+
+        self.planned_columns = planned
+        return planned
+
+    def ingest_usecols(self, form, columns):
+        """
+        Picks the columns to read from an IRS core file: those whose IRS or crosswalked NCCS name is in the
+        columns returned by plan_columns.  If project_columns is False, every column is read.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        columns (list) : The column names in the header of the IRS file
+
+        RETURNS
+        list : The column names to read, in the order they appear in the file
+        """
+        if not self.project_columns:
+            return list(columns)
+
+        xwalk = self.load_crosswalk(form)
+        planned = self.plan_columns()
+        return [c for c in columns if c.upper() in planned or xwalk.get(c.upper(), c.upper()) in planned]
+
     def drop_missing(self):
         """
         Drops "zero filers" when ALL of the values for a given EIN over the columns specified in the "drop if missing"
@@ -344,17 +735,7 @@ class Data(LoadData, BMFShare):
         drop_criteria = ['N','0', 0]
 
         for form in main.forms:
-            drop_list = []
-            drop_file = os.path.join(main.path, 'settings', 'drop if missing', '{}.txt'.format(form.lower()))
-            with open(drop_file, 'r') as f:
-                _ = f.readline() #drop the line of instructions at the top
-
-                #tries to crosswalk the entry from the droplist, but if it's not in the crosswalk then it is appended as-is
-                for line in f:
-                    try:
-                        drop_list.append(xwalks[form][line.strip().upper()])
-                    except KeyError:
-                        drop_list.append(line.strip().upper())
+            drop_list = self.load_droplist(form, xwalks[form])
 
             self.droplists[form] = drop_list
 
@@ -367,6 +748,30 @@ class Data(LoadData, BMFShare):
                   format(start_obs-end_obs, form, self.core_file_year, form))
         main.logger.info('Observations missing all values from "drop if missing" dropped.\n')
 
+    def load_droplist(self, form, xwalk):
+        """
+        Reads the columns to check for zero-filer status from the "settings/drop if missing" folder.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        xwalk (dict) : The crosswalk for the form, from load_crosswalk
+
+        RETURNS
+        list : NCCS column names
+        """
+        drop_list = []
+        drop_file = os.path.join(self.main.path, 'settings', 'drop if missing', '{}.txt'.format(form.lower()))
+        with open(drop_file, 'r') as f:
+            _ = f.readline() #drop the line of instructions at the top
+
+            #tries to crosswalk the entry from the droplist, but if it's not in the crosswalk then it is appended as-is
+            for line in f:
+                try:
+                    drop_list.append(xwalk[line.strip().upper()])
+                except KeyError:
+                    drop_list.append(line.strip().upper())
+        return drop_list
+
     def drop_on_values(self):
         """
         Method for dropping only specific values of the data.  Currently only used to remove SUBSECCD != 92
@@ -410,6 +815,15 @@ class Data(LoadData, BMFShare):
         current_yr = self.core_file_year #int, 2014, 2015
         backfill_years = [current_yr - y for y in range(1, backfill+1)] #list, [2014, 2013, 2012] if current_yr = 2015
 
+        #only EINs missing from the current release can be backfilled, so only those are retrieved; every year is
+        #filtered against the release as it was before backfilling, so all the tables can be fetched at once
+        current_cols = {form:['EIN']+df.columns.tolist() for form, df in main.write.data_dict.items()}
+        start_eins = {form:df.index for form, df in main.write.data_dict.items()}
+        self.prefetch_sql([{'fname':'core{}{}'.format(year, form.lower()), 'dbase':'coreco' if form == 'CO' else 'nccs',
+                            'cols':current_cols[form], 'match_dtypes':main.write.data_dict[form], 'eins':start_eins[form], 'exclude_eins':True,
+                            'missing_ok':True}
+                           for form in main.write.data_dict.keys() for year in backfill_years])
+
         for form in main.write.data_dict.keys():
             self.backfilled[form] = {}
 
@@ -421,7 +835,8 @@ class Data(LoadData, BMFShare):
             for year in backfill_years:
                 fname = 'core{}{}'.format(year, form.lower())
                 main.logger.info('Loading prior release {} from MySQL...'.format(fname))
-                old = self.get_sql(fname, dbase, match_dtypes=main.write.data_dict[form])
+                old = self.get_sql(fname, dbase, cols=current_cols[form], match_dtypes=main.write.data_dict[form],
+                                   eins=start_eins[form], exclude_eins=True, missing_ok=True) #older releases lack some current columns
                 main.logger.info('    success.')
 
                 old['SOURCE'] = fname
@@ -448,6 +863,8 @@ class Data(LoadData, BMFShare):
 
                 main.logger.info('Backfilled {} observations into {} from {}.'.format(len(backfill_obs), form, year))
 
+        self.encode_codes(main.write.data_dict) #the backfilled rows came in as strings
+        self.arrow_text(main.write.data_dict)
         main.logger.info('All missing EINs backfilled from previous releases.\n')
 
     def init_final(self):
@@ -493,9 +910,8 @@ class Data(LoadData, BMFShare):
         None
         """
         main = self.main
-        if 'EZ' in main.forms or 'Full' in main.forms:
-            df_epost = self.download_epostcard()
-
+        df_epost = self.epostcard_data()
+        if df_epost is not None:
             if 'Full' in main.forms:
                 main.data_dict['Full'] = main.data_dict['Full'].merge(df_epost, how='left', left_index=True, right_index=True)
                 main.logger.info('Merged EPOSTCARD data with Full.')
@@ -505,6 +921,125 @@ class Data(LoadData, BMFShare):
 
             main.logger.info('Finished merging EPOSTCARD data for 990n indicator.\n')
 
+    def epostcard_data(self):
+        """
+        The loading half of the epostcard method: downloads the epostcard data for the EINs in the EZ and Full
+        forms, if either is being built.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        DataFrame, or None if neither EZ nor Full is being built
+        """
+        main = self.main
+        if 'EZ' in main.forms or 'Full' in main.forms:
+            #only the EINs of the forms merged in are kept from the epostcard data
+            forms = [form for form in ['EZ', 'Full'] if form in main.forms]
+            eins = main.data_dict[forms[0]].index
+            if len(forms) > 1:
+                eins = eins.union(main.data_dict[forms[1]].index)
+            return self.download_epostcard(eins=eins)
+        return None
+
+    def enrich(self):
+        """
+        Attaches the NTEE, FIPSMSA, EPOSTCARD and BMF columns to each form in one pass, with the same result as
+        running the ntee, fipsmsa, epostcard and bmf methods in turn.  All four lookup tables are loaded first;
+        then for each form the position of every EIN (or FIPS code) in each table is found once, the new
+        columns are taken by position, and the form is copied only once, when they are all added together,
+        rather than once per merge.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        main = self.main
+        ntee = self.ntee_data()
+        fipsmsa, fipsmsa_cols = self.fipsmsa_data()
+        df_epost = self.epostcard_data()
+        bmf, (all_cols, copc_cols, pf_cols) = self.bmf_data()
+
+        for form in main.forms:
+            joins = [('NTEE', ntee, None), ('FIPSMSA', fipsmsa, 'FIPS')]
+            if form in ['EZ', 'Full']:
+                joins.append(('EPOSTCARD', df_epost, None))
+            joins.append(('BMF', bmf[all_cols+pf_cols] if form == 'PF' else bmf[all_cols+copc_cols], None))
+            main.data_dict[form] = self.attach_columns(main.data_dict[form], joins)
+            main.logger.info('Attached {} columns to {} in one pass.'.format(', '.join([j[0] for j in joins]), form))
+
+        main.logger.info('Completed merging in NTEE, FIPSMSA, EPOSTCARD and BMF data.\n')
+
+    def attach_columns(self, df, joins):
+        """
+        Left-joins several lookup tables onto a dataframe, matching DataFrame.merge(how='left') exactly: rows keep
+        their order, even where EINs are duplicated (as merge does from pandas 2.2 on), rows with no match get NaN,
+        and a column name already present gets the suffix "_x" on the existing column and "_y" on the new one.  A
+        table whose keys are not unique would add rows rather than columns, so it is merged the usual way instead.
+
+        With the check_joins setting on, the same tables are also merged one after another with DataFrame.merge,
+        and the two results are asserted to be equal.
+
+        ARGUMENTS
+        df (DataFrame) : Data indexed by EIN
+        joins (list) : (name, table, on) for each lookup table in turn; on is None to join on the index of both,
+                       or the name of a column of the data (and the table) to join on
+
+        RETURNS
+        DataFrame
+        """
+        if self.check_joins:
+            merged = df
+            for name, table, on in joins:
+                if on is None:
+                    merged = merged.merge(table, how='left', left_index=True, right_index=True)
+                else:
+                    merged = merged.reset_index().merge(table, on=on, how='left').set_index(df.index.name)
+
+        columns = [[c, c, None] for c in df.columns] #[current name, column of df or None, values taken from a lookup]
+
+        def _values(name):
+            for col in columns:
+                if col[0] == name:
+                    return df[col[1]].values if col[2] is None else col[2]
+
+        def _build():
+            new = {i:col[2] for i, col in enumerate(columns) if col[2] is not None}
+            out = pd.concat([df.loc[:, [col[1] for col in columns if col[2] is None]], pd.DataFrame(new, index=df.index)], axis=1)
+            out.columns = [col[0] for col in columns if col[2] is None] + [columns[i][0] for i in new]
+            return out
+
+        for name, table, on in joins:
+            lookup = table if on is None else table.set_index(on)
+            if not lookup.index.is_unique:
+                df = _build()
+                if on is None:
+                    df = df.merge(table, how='left', left_index=True, right_index=True)
+                else:
+                    df = df.reset_index().merge(table, on=on, how='left').set_index(df.index.name)
+                columns = [[c, c, None] for c in df.columns]
+                continue
+
+            keys = df.index if on is None else pd.Index(_values(on))
+            indexer = lookup.index.get_indexer(keys)
+            current = set([col[0] for col in columns])
+            for c in lookup.columns:
+                if c in current:
+                    for col in columns:
+                        if col[0] == c:
+                            col[0] = c+'_x'
+                    c_new = c+'_y'
+                else:
+                    c_new = c
+                columns.append([c_new, None, pd.api.extensions.take(lookup[c].values, indexer, allow_fill=True)])
+
+        df = _build()
+        if self.check_joins:
+            pd.testing.assert_frame_equal(df, merged)
+        return df
+
     def prior_year(self):
         """
         Merges selected prior year variables into current data, appending 'P' to the end OR changing 'EOY' to 'BOY'
@@ -542,7 +1077,7 @@ class Data(LoadData, BMFShare):
                 dbase = 'coreco'
             else:
                 dbase = 'nccs'
-            old = self.get_sql(fname, dbase, cols=cols, match_dtypes=df)
+            old = self.get_sql(fname, dbase, cols=cols, match_dtypes=df, eins=df.index)
             main.logger.info('    success.')
 
             # old = old[cols]
@@ -551,7 +1086,7 @@ class Data(LoadData, BMFShare):
             merged = df.merge(old, how='left', left_index=True, right_index=True)
             #finds the indexes where the past FISYR (FISYRP) is not equal to the current FISYR - 1
             #note that this includes any entry where FISYR or FISYRP are NaN
-            merged['bad_fisyr'] = ~merged.apply(lambda r: float(r.FISYR) == float(r.FISYRP) + 1, axis=1)
+            merged['bad_fisyr'] = ~merged[['FISYR', 'FISYRP']].apply(lambda r: float(r.FISYR) == float(r.FISYRP) + 1, axis=1)
 
             #replaces the newly-merged values with NaN if FISYRP != FISYR - 1
             bad_ilocs = merged.reset_index()[merged.reset_index()['bad_fisyr']].index
@@ -573,8 +1108,13 @@ class Data(LoadData, BMFShare):
 
         if 'EZ' in main.forms:
             main.logger.info('Loading prior year NCCS release data...')
+            year = self.core_file_year - 1
+            self.prefetch_sql([{'fname':'core{}{}'.format(year, form.lower()), 'dbase':'coreco' if form == 'CO' else 'nccs',
+                                'cols':cols, 'match_dtypes':main.write.data_dict[form], 'eins':main.write.data_dict[form].index}
+                               for form in ['CO', 'PC']])
             for form in ['CO', 'PC']:
                 main.write.data_dict[form] = _prior_year(main.write.data_dict[form], form)
+            self.encode_codes(main.write.data_dict) #adds INPRIOR
 
             main.logger.info('All past data loaded.\n')
 
@@ -630,10 +1170,10 @@ class Data(LoadData, BMFShare):
 
     def make_numeric(self):
         """
-        Handles converting the dtypes for columns that are used in mathematical operations later into floats, from the default strings.
-
-        This method should be generalized, or, better yet, dtypes should be made explicit from the beginning.  This is raised as a
-        github issue.
+        Handles converting the dtypes for columns that are used in mathematical operations later into floats, and filling their
+        missing values with 0.  Numeric IRS columns are already parsed as numbers when they are read (see ingest_dtypes), so for
+        those this only fills the blanks; columns that arrive as strings (from the merged data, or IRS columns with non-numeric
+        entries) are converted here.
 
         ARGUMENTS
         None
@@ -648,4 +1188,6 @@ class Data(LoadData, BMFShare):
             for col in num_cols:
                 main.data_dict[form][col] = pd.to_numeric(main.data_dict[form][col], errors='coerce').fillna(0) #recast the str columns to float64 or int64
             main.logger.info('Recast {} columns as numeric for form {}.'.format(len(num_cols), form))
+        self.sparsify(main.data_dict)
+        self.arrow_text(main.data_dict)
         main.logger.info('Finished initializing final dataframes.  Check nccs.data.numeric_columns dictionary for details.\n')
@@ -0,0 +1,236 @@
+import os
+import io
+import json
+import queue
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class DownloadManager():
+    """
+    Runs the downloads from the IRS on a bounded pool of threads that all share one keep-alive
+    requests.Session.  Every URL the build needs can be started at once, and the parsers in the LoadData
+    class then pick up each file as soon as it has finished, instead of waiting on each transfer in turn.
+
+    The actual transfer is still done by the fetch_file method of the Data class it is given, so the
+    download folder, read-only flags and logging all behave exactly as they do for a single download.
+    """
+    def __init__(self, data, workers):
+        self.data = data
+        self.workers = workers
+        self.session = requests.Session()
+        self.session.headers.update(data.headers)
+        self.pool = None
+        self.futures = {} #{url: Future} for every download started and not yet handed to a parser
+        self.lock = threading.Lock()
+
+    def submit(self, url, force=False, job=None):
+        """
+        Starts downloading the specified URL in the background, unless it has already been started.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        force (bool) : Default False, passed through to the fetch_file method
+        job (func) : Default None, a method to run in place of fetch_file, e.g. download_form, which
+                     downloads and parses a core file at the same time.  It is called with the URL only.
+
+        RETURNS
+        Future
+        """
+        with self.lock:
+            if url not in self.futures:
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(max_workers=self.workers)
+                if job is None:
+                    self.futures[url] = self.pool.submit(self.data.fetch_file, url, force)
+                else:
+                    self.futures[url] = self.pool.submit(job, url)
+            return self.futures[url]
+
+    def started(self, url):
+        """
+        Returns True if the specified URL has been started in the background and not yet collected.
+        """
+        return url in self.futures
+
+    def result(self, url):
+        """
+        Waits for a download started with the submit method to finish, then returns its location on the
+        local file system.  Any exception raised during the download is raised here.
+
+        ARGUMENTS
+        url (str) : A URL previously passed to submit
+
+        RETURNS
+        str : Location on local file system of the downloaded file
+        """
+        future = self.futures[url]
+        output_file = future.result()
+        with self.lock:
+            self.futures.pop(url, None)
+        return output_file
+
+    def as_completed(self, urls, force=False, job=None):
+        """
+        Generator that starts any of the specified URLs that are not already running, then yields each one
+        as soon as its download has finished, in whatever order they finish.
+
+        ARGUMENTS
+        urls (list) : Any valid URLs
+        force (bool) : Default False, passed through to the fetch_file method for URLs not yet started
+        job (func) : Default None, passed through to the submit method for URLs not yet started
+
+        RETURNS
+        Generator of (str, str) : The URL, and the location on the local file system of its download (or
+                                  whatever the job method returns)
+        """
+        futures = {self.submit(url, force, job):url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            yield url, self.result(url)
+
+    def close(self):
+        """
+        Waits for any downloads still running, then shuts down the thread pool and the shared session.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.session.close()
+
+class DownloadPipe(io.RawIOBase):
+    """
+    A read-only file object fed from another thread.  stream_file pushes each chunk of a download into it
+    as the chunk arrives, while pd.read_csv reads from it on the parsing side, so a file can be parsed at
+    the same time as it is downloaded.  The queue between the two is bounded, so if parsing falls behind
+    the download simply waits rather than piling the file up in memory.
+    """
+    def __init__(self, maxsize=64):
+        super().__init__()
+        self.queue = queue.Queue(maxsize)
+        self.buffer = memoryview(b'')
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def put(self, item):
+        """
+        Adds a chunk (or the end-of-file marker, or an exception) to the queue, giving up with an IOError
+        if the parsing side has closed the pipe in the meantime.
+        """
+        while True:
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                if self.closed:
+                    raise IOError('Download pipe closed by the reader.')
+
+    def feed(self, chunk):
+        """
+        Passes the next chunk of the download to the parsing side.
+        """
+        self.put(chunk)
+
+    def finish(self):
+        """
+        Marks the end of the download.
+        """
+        self.put(None)
+
+    def fail(self, exc):
+        """
+        Passes an exception from the downloading side, to be raised on the parsing side.
+        """
+        self.put(exc)
+
+    def readinto(self, b):
+        while len(self.buffer) == 0 and not self.finished:
+            item = self.queue.get()
+            if item is None:
+                self.finished = True
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                self.buffer = memoryview(item)
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+class DownloadManifest():
+    """
+    Keeps a record, in a json file next to the "downloads/IRS" folder, of every file downloaded from the
+    IRS: its URL, the ETag and Last-Modified headers the server sent with it, its size and its SHA-256.
+    Those are used to make conditional requests, so a file that has not changed on the IRS server since
+    the last run is never transferred again (the server answers "304 Not Modified" instead).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def get(self, url):
+        """
+        Returns the manifest entry for the specified URL, or None if it has never been downloaded.
+        """
+        return self.entries.get(url)
+
+    def conditional_headers(self, url, output_file):
+        """
+        Builds the If-None-Match and If-Modified-Since headers for the specified URL.  These are only sent if
+        the local copy is still the one the manifest describes, since otherwise a "304 Not Modified" answer
+        would leave the build using the wrong file.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system of the existing download
+
+        RETURNS
+        dict : Request headers, empty if no conditional request can be made
+        """
+        entry = self.get(url)
+        headers = {}
+        if entry is None or not os.path.exists(output_file) or os.path.getsize(output_file) != entry['size']:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url, output_file, response_headers, size, sha256):
+        """
+        Adds or replaces the entry for the specified URL after a completed download, then saves the manifest.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system of the download
+        response_headers (dict) : Headers returned by the IRS server
+        size (int) : Size of the download in bytes
+        sha256 (str) : Hex digest of the download
+
+        RETURNS
+        None
+        """
+        with self.lock:
+            self.entries[url] = {'file':os.path.basename(output_file),
+                                 'etag':response_headers.get('ETag'),
+                                 'last_modified':response_headers.get('Last-Modified'),
+                                 'size':size,
+                                 'sha256':sha256}
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path) #replaced in one step, so an interrupted run can't leave half a manifest
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+def _parse(eins):
+    """
+    Parses EINs as numbers, removing hyphens first, as some NCCS tables (e.g. nteedocAllEins) have them.
+
+    ARGUMENTS
+    eins (array-like) : EINs as strings or numbers
+
+    RETURNS
+    Series : float64 or int64, with NaN for any EIN that is missing or is not a number
+    """
+    eins = pd.Series(np.asarray(eins))
+    if eins.dtype == np.int64:
+        return eins
+    if not pd.api.types.is_numeric_dtype(eins): #object, or the str dtype of newer pandas
+        eins = eins.astype(str).str.replace('-', '').str.strip()
+    return pd.to_numeric(eins, errors='coerce')
+
+def ein_to_int(eins):
+    """
+    Converts EINs to the int64 keys used in every index of the build.  Joins, groupbys and set operations on
+    int64 are much faster, and far smaller in memory, than on 9-character strings.  Hyphens are removed first,
+    as some NCCS tables (e.g. nteedocAllEins) have them.  A ValueError is raised if any EIN is missing or is
+    not a number; see convert_eins for data that may have some.
+
+    ARGUMENTS
+    eins (array-like) : EINs as strings or numbers
+
+    RETURNS
+    Array of int64
+    """
+    ints = _parse(eins)
+    bad = ints.isnull()
+    if bad.any():
+        raise ValueError('Expected numeric EINs, but found {} others, e.g. {}'.format(bad.sum(), np.asarray(eins)[bad.values][:3].tolist()))
+    return ints.astype(np.int64).values
+
+def convert_eins(df, logger, name, column='EIN'):
+    """
+    Converts the EINs of a dataframe with ein_to_int, after dropping the rows whose EIN is missing or is not a
+    number.  Such rows come up in the IRS and NCCS tables from time to time, and could never be matched to a
+    row of another table anyway; the number dropped is logged.
+
+    ARGUMENTS
+    df (DataFrame) : Data with a column of EINs
+    logger (Logger) : Where to log the rows dropped
+    name (str) : Name of the data, for the log
+    column (str) : Default 'EIN', the column of EINs; None converts the index instead
+
+    RETURNS
+    DataFrame
+    """
+    eins = df.index if column is None else df[column]
+    ints = _parse(eins)
+    bad = ints.isnull().values
+    if bad.any():
+        logger.info('Dropped {} rows of {} with a missing or malformed EIN, e.g. {}.'.format(bad.sum(), name, np.asarray(eins)[bad][:3].tolist()))
+        df = df[~bad].copy()
+        ints = ints[~bad]
+    ints = ints.astype(np.int64).values
+    if column is None:
+        df.index = pd.Index(ints, name=df.index.name)
+    else:
+        df[column] = ints
+    return df
+
+def ein_to_str(eins):
+    """
+    Renders int64 EINs as the 9-character, zero-padded strings used in the released files, the validation
+    files and the NCCS database.
+
+    ARGUMENTS
+    eins (array-like) : EINs from ein_to_int
+
+    RETURNS
+    Index of str, with object dtype as for any other string index
+    """
+    return pd.Index(np.asarray(eins)).astype(str).str.zfill(9).astype(object)
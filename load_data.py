@@ -1,14 +1,37 @@
 import os, sys
+import io
 import re
+import json
+import time
+import hashlib
+import threading
 import zipfile
+import contextlib
 import requests
 import warnings
 import logging
 import pandas as pd
 import numpy as np
-from stat import S_IREAD, S_IRGRP, S_IROTH
+from stat import S_IREAD, S_IWRITE, S_IRGRP, S_IROTH
 import getpass
 import pymysql
+from download_manager import DownloadManager, DownloadManifest, DownloadPipe
+from parse_cache import ParseCache
+from ntee_store import NTEEStore
+from sql_pool import SQLPool
+from sql_backend import MySQLBackend, SQLiteBackend
+from sql_cache import SQLCache
+from ein import ein_to_str, convert_eins
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+#the strings pd.read_csv reads as missing values by default (as of pandas 2.0), for the pyarrow parser
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA',
+             'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
 
 # Code by Jeff Levy (jlevy@urban.org), 2016-2017
 
@@ -127,22 +150,28 @@ class LoadData():
         None
         """
         main = self.main
-        delim = self.irs_delim
         current_yr = self.core_file_year #int
 
         main.logger.info('Beginning any necessary downloads from the IRS.')
+        if self.cache_parsed and not self.parse_cache.available:
+            main.logger.info('The pyarrow package is not installed, so parsed core files will not be cached.')
 
+        form_urls = {}
         for form in main.forms:
             try:
-                url = self.urls[form][current_yr]
+                form_urls[self.urls[form][current_yr]] = form
             except KeyError:
-                raise Exception('URL not found for core file year {}, form {}.  Please check the "urls" folder.'.format(current_year, form))
-            df = pd.read_csv(self.download_file(url), sep=delim, dtype='str')
+                raise Exception('URL not found for core file year {}, form {}.  Please check the "urls" folder.'.format(current_yr, form))
+
+        #all of the forms are downloaded and parsed at the same time, and collected in whatever order they finish
+        for url, df in self.downloads.as_completed(list(form_urls.keys()), job=self.download_form):
+            form = form_urls[url]
 
             #Most IRS files have EIN in caps, but at least one (2012 EZ) has it in lowercase
             if 'ein' in df.columns:
                 df.rename(columns={'ein':'EIN'}, inplace=True)
 
+            df = convert_eins(df, main.logger, url.split('/')[-1])
             df.set_index('EIN', inplace=True)
 
             #adds the source file name as a column
@@ -151,17 +180,387 @@ class LoadData():
 
         main.logger.info('Downloading complete.\n')
 
+    def download_form(self, url):
+        """
+        Downloads and parses one of the main core files.  When the file has to come from the IRS (and the
+        pipeline_parse setting is on), the download is streamed into the parser as it arrives, so the file is
+        parsed in chunks of self.parse_chunksize rows while the rest of it is still being transferred; the
+        chunks are concatenated once the last one is parsed.  Files already in "downloads/IRS" and zip files
+        (whose index sits at the end of the archive) are downloaded first and then parsed as before.
+
+        If the cache_parsed setting is on, a file that is unchanged since it was last parsed is loaded from the
+        parsed cache (see parse_cache.py) instead, and a newly parsed file is added to it.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+
+        RETURNS
+        DataFrame
+        """
+        main = self.main
+
+        fname = url.split('/')[-1]
+        output_file = os.path.join(main.path, self.irs_download_folder, fname)
+        needs_download = main.force_new_download or not os.path.exists(output_file)
+
+        #the form is needed to pick the right crosswalk for the ingest schema
+        form = [f for f in main.forms if self.urls[f].get(self.core_file_year) == url][0]
+
+        #with the cache on, the whole file is parsed so it can be stored, and the unused columns dropped after
+        caching = self.cache_parsed and self.parse_cache.available
+
+        if not self.pipeline_parse or not needs_download or fname.endswith('.zip'):
+            output_file = self.fetch_file(url)
+            if caching:
+                key = self.parse_cache_key(url, output_file, form)
+                df = self.load_parsed(fname, key, form)
+                if df is not None:
+                    return df
+            with self.open_download(output_file) as f:
+                df = self.read_form(f, form, project=not caching)
+        else:
+            pipe = DownloadPipe()
+            producer = threading.Thread(target=self.pipe_file, args=(url, output_file, pipe), daemon=True)
+            producer.start()
+
+            chunks = []
+            with io.BufferedReader(pipe, self.download_chunk_size) as f:
+                for chunk in self.read_form(f, form, chunksize=self.parse_chunksize, project=not caching):
+                    chunks.append(chunk)
+            producer.join()
+            main.logger.info('File {} parsed in {} chunks while downloading.'.format(fname, len(chunks)))
+            df = pd.concat(chunks)
+            if caching:
+                key = self.parse_cache_key(url, output_file, form)
+
+        if caching:
+            df = self.cache_types(form, df)
+            try:
+                self.parse_cache.store(fname, key, df)
+            except pa.ArrowException as e:
+                main.logger.info('    could not cache {} as Parquet ({}); it will be parsed again next run.'.format(fname, e))
+            df = df[self.form_columns(form, df.columns.tolist())]
+        return df
+
+    def read_form(self, f, form, chunksize=None, project=True):
+        """
+        Parses an IRS core file from an open (binary) file object.  The header line is read first so the
+        ingest schema can be built from the actual column names (see ingest_dtypes and ingest_usecols in the
+        Data class), then the rest of the file is parsed with numeric columns typed as numbers and all others
+        as strings, skipping any column the build does not use.
+
+        ARGUMENTS
+        f (file) : Binary file object positioned at the start of the file
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        chunksize (int) : Default None, if given returns an iterator of DataFrames of this many rows
+        project (bool) : Default True, if False every column is read, even those the build does not use
+
+        RETURNS
+        DataFrame, or TextFileReader if chunksize is given
+        """
+        delim = self.irs_delim
+        header = pd.read_csv(io.BytesIO(f.readline()), sep=delim, nrows=0).columns.tolist()
+        dtype = self.ingest_dtypes(form, header)
+        usecols = self.form_columns(form, header) if project else None
+        #low_memory=False types each column from all of its values (or all those in the chunk), rather than piece by piece
+        return self.read_csv(f, sep=delim, names=header, usecols=usecols, dtype=dtype, chunksize=chunksize, low_memory=False)
+
+    def read_csv(self, f, sep, names=None, usecols=None, dtype=None, chunksize=None, **kwargs):
+        """
+        Parses a delimited file with the parser selected by the parser_engine setting: 'c' is the pandas
+        parser, which runs on a single core, and 'pyarrow' is the multithreaded pyarrow CSV reader (see
+        read_csv_pyarrow).  Both return the same DataFrame, with the same dtypes, but for the differences noted
+        in read_csv_pyarrow.
+
+        ARGUMENTS
+        f (file) : Binary file object
+        sep (str) : Delimiter
+        names (list) : Default None, the column names if the file has no header line; if None the first line
+                       is the header
+        usecols (list) : Default None, the columns to read, by name, or by position when the file has no header
+        dtype (str or dict) : Default None, 'str' for all columns, or a dict of {column: 'str'}; any other
+                              column is typed by the parser
+        chunksize (int) : Default None, if given returns an iterator of DataFrames; the pyarrow parser always
+                          returns the whole file as a single chunk
+        kwargs : Any other pd.read_csv arguments, used by the 'c' parser only
+
+        RETURNS
+        DataFrame, or an iterator of DataFrames if chunksize is given
+        """
+        if self.parser_engine == 'pyarrow':
+            df = self.read_csv_pyarrow(f, sep, names, usecols, dtype)
+            return df if chunksize is None else iter([df])
+
+        if names is not None:
+            kwargs['header'] = None
+        return pd.read_csv(f, sep=sep, names=names, usecols=usecols, dtype=dtype, chunksize=chunksize, **kwargs)
+
+    def read_csv_pyarrow(self, f, sep, names, usecols, dtype):
+        """
+        The pyarrow backend for read_csv.  Columns to be read as strings are declared as strings up front (so
+        values such as EINs keep their leading zeros) and the rest are typed by pyarrow, with the same missing
+        value markers pandas uses; missing strings are then set to NaN, as pandas does.
+
+        The undeclared (numeric) columns are left to pyarrow's type inference, since a declared numeric type
+        would make pyarrow fail on a column holding a non-number, where pandas falls back to strings.  Its
+        results are then given the types the pandas parser gives the same values: a column with no values at
+        all is float64 rather than untyped, and one pyarrow reads as dates or times is strings.  Two
+        differences remain.  With chunksize, the pandas parser types each chunk on its own, so a column can be
+        numbers in some chunks and strings in others, where pyarrow makes it strings throughout (see
+        cache_types).  And pandas before 2.0 does not read 'None' as missing, where this always does.
+
+        ARGUMENTS
+        f (file) : Binary file object
+        sep (str) : Delimiter
+        names (list) : The column names if the file has no header line, otherwise None
+        usecols (list) : The columns to read, by name, or by position when the file has no header
+        dtype (str or dict) : 'str' for all columns, a dict of {column: 'str'}, or None
+
+        RETURNS
+        DataFrame
+        """
+        read_options = pa_csv.ReadOptions(use_threads=True, block_size=self.download_chunk_size)
+        if names is None:
+            names = pd.read_csv(io.BytesIO(f.readline()), sep=sep, nrows=0).columns.tolist()
+
+        if usecols is not None and all(isinstance(c, int) for c in usecols):
+            #headerless file where only the positions of the columns are known
+            read_options.autogenerate_column_names = True
+            columns = ['f{}'.format(c) for c in usecols]
+            rename = dict(zip(columns, names))
+            names = columns
+        else:
+            read_options.column_names = names
+            columns = names if usecols is None else [c for c in names if c in usecols]
+            rename = {}
+
+        if dtype == 'str':
+            column_types = {c:pa.string() for c in columns}
+        else:
+            column_types = {c:pa.string() for c, d in (dtype or {}).items() if c in columns and d == 'str'}
+
+        convert_options = pa_csv.ConvertOptions(column_types=column_types,
+                                                include_columns=columns,
+                                                null_values=NA_VALUES,
+                                                strings_can_be_null=True,
+                                                quoted_strings_can_be_null=True)
+        table = pa_csv.read_csv(f, read_options=read_options,
+                                parse_options=pa_csv.ParseOptions(delimiter=sep),
+                                convert_options=convert_options)
+        for i, field in enumerate(table.schema):
+            if pa.types.is_null(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+            elif pa.types.is_temporal(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+        df = table.to_pandas().rename(columns=rename)
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notnull(), np.nan)
+        return df
+
+    def form_columns(self, form, header):
+        """
+        Records the full header of an IRS core file, then returns the columns from it that should be kept.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        header (list) : Every column name in the IRS file
+
+        RETURNS
+        list : The column names to keep, in the order they appear in the file
+        """
+        usecols = self.ingest_usecols(form, header)
+        self.source_columns[form] = header
+        if len(usecols) < len(header):
+            self.main.logger.info('Reading {} of the {} columns in the {} file.'.format(len(usecols), len(header), form))
+        return usecols
+
+    def cache_types(self, form, df):
+        """
+        Gives each column of a parsed core file a single type, so it can be stored in the parsed cache.  A numeric
+        column holding anything that isn't a number (e.g. an 'N' in TOTREV) is left by the parser as objects, mixing
+        numbers and strings, which Parquet can't store; it is converted to numbers here, with NaN for the values
+        that aren't, as make_numeric would do later anyway.  Any other column mixing types is made strings.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+        df (DataFrame) : The core file, as parsed with the ingest schema of the form
+
+        RETURNS
+        DataFrame
+        """
+        schema = self.ingest_schema[form]
+        for col in df.columns[df.dtypes == object]:
+            if schema.get(col) == 'numeric':
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            elif pd.api.types.infer_dtype(df[col], skipna=True) not in ['string', 'empty']:
+                df[col] = df[col].where(df[col].isnull(), df[col].astype(str))
+        return df
+
+    def schema_version(self, form):
+        """
+        Builds a short hash of everything that decides how a core file is parsed: the crosswalk and "drop if
+        missing" list for the form, the list of numeric columns, the parser_engine and the pandas version.  A
+        change to any of them invalidates the parsed cache for that form.
+
+        ARGUMENTS
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+
+        RETURNS
+        str
+        """
+        schema = hashlib.sha256()
+        for folder in ['crosswalk', 'drop if missing']:
+            with open(os.path.join(self.main.path, 'settings', folder, '{}.txt'.format(form.lower())), 'rb') as f:
+                schema.update(f.read())
+        schema.update(','.join(sorted(self.numeric_columns)).encode())
+        schema.update(self.parser_engine.encode())
+        schema.update(pd.__version__.encode())
+        return schema.hexdigest()[:16]
+
+    def parse_cache_key(self, url, output_file, form):
+        """
+        Builds the parsed cache key for a downloaded core file from its SHA-256 and the schema version.  The
+        hash is taken from the download manifest when it describes the local file, and computed otherwise.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system of the download
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+
+        RETURNS
+        str
+        """
+        return '{}-{}'.format(self.source_sha256(url, output_file), self.schema_version(form))
+
+    def source_sha256(self, url, output_file):
+        """
+        Returns the SHA-256 of a downloaded file, from the download manifest when it describes the local file,
+        and computed from the file otherwise.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system of the download
+
+        RETURNS
+        str
+        """
+        entry = self.manifest.get(url)
+        if entry is not None and entry['size'] == os.path.getsize(output_file):
+            return entry['sha256']
+        file_hash = hashlib.sha256()
+        with open(output_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.download_chunk_size), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def load_parsed(self, fname, key, form):
+        """
+        Loads a core file from the parsed cache, reading only the columns the build uses.
+
+        ARGUMENTS
+        fname (str) : File name of the IRS download
+        key (str) : Cache key from the parse_cache_key method
+        form (str) : The form, e.g. 'EZ', 'Full', 'PF'
+
+        RETURNS
+        DataFrame, or None if the file is not in the cache
+        """
+        entry = self.parse_cache.get(fname, key)
+        if entry is None:
+            return None
+        self.ingest_dtypes(form, entry['columns'])
+        df = self.parse_cache.load(fname, key, columns=self.form_columns(form, entry['columns']))
+        self.main.logger.info('File {} loaded from the parsed cache.'.format(fname))
+        return df
+
+    def pipe_file(self, url, output_file, pipe):
+        """
+        The downloading side of download_form, run on its own thread: streams the URL to disk with
+        stream_file while passing each chunk into the pipe the parser is reading from.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system to write the download to
+        pipe (DownloadPipe) : The pipe being read by the parser
+
+        RETURNS
+        None
+        """
+        main = self.main
+        fname = os.path.basename(output_file)
+        try:
+            modified = self.stream_file(url, output_file, conditional=not main.force_new_download, pipe=pipe)
+            if modified:
+                main.logger.info('File {} downloaded.'.format(fname))
+            else:
+                main.logger.info('File {} unchanged on the IRS server; using existing contents in downloads.'.format(fname))
+                with open(output_file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(self.download_chunk_size), b''):
+                        pipe.feed(chunk)
+        except Exception as e:
+            pipe.fail(e)
+        else:
+            pipe.finish()
+
+    def start_downloads(self):
+        """
+        Starts every download the build will need from the IRS at once: the core files for the current year,
+        the BMF regions and the epostcard data.  They run in the background on the download manager's thread
+        pool, so they can be started before the (slow, interactive) MySQL login and then picked up by the
+        download, download_bmf and download_epostcard methods as they finish.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        main = self.main
+
+        for form in main.forms:
+            if self.core_file_year in self.urls[form]:
+                self.downloads.submit(self.urls[form][self.core_file_year], job=self.download_form)
+        for url in self.urls['BMF'].values():
+            self.downloads.submit(url)
+        if 'EZ' in main.forms or 'Full' in main.forms:
+            self.downloads.submit(self.urls['epostcard'], force=True)
+
+        main.logger.info('Started downloads from the IRS in the background.\n')
+
+    def close_downloads(self):
+        """
+        Shuts down the download manager's thread pool and shared connection once all IRS files are in.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        self.downloads.close()
+
     def sql_auth(self):
         """
         Handles logging into the NCCS MySQL server, including prompting for credentials.
 
+        If the sql_backend setting is 'sqlite', the local SQLite data store is used instead (see the
+        SQLiteBackend class): the tables in the "downloads/nccs" folder, as CSV files or in the Parquet mirror,
+        are bulk-loaded into it where they are new or changed, and no login is needed.
+
         ARGUMENTS
         None
 
         RETURNS
         None
         """
-        if self.get_from_sql:
+        if self.sql_backend == 'sqlite':
+            self.main.logger.info('Loading the downloads/nccs folder into the local SQLite data store...')
+            self.sql_store = SQLiteBackend(os.path.join(self.main.path, 'downloads', 'sqlite'))
+            self.sql_store.load_folder(os.path.join(self.main.path, self.nccs_download_folder), self.numeric_columns, self.main.logger, mirror=self.nccs_mirror)
+            self.sql_connection = self.sql_connect()
+            self.sql_pool = SQLPool(self.sql_connect, self.sql_workers, first=self.sql_connection)
+            self.main.logger.info('    will retrieve all necessary data from the SQLite data store.\n')
+        elif self.get_from_sql:
             self.main.logger.info('Authenticating connection to MySQL server...')
             un = input('    MySQL user name: ')
             if sys.stdin.isatty():
@@ -171,20 +570,35 @@ class LoadData():
                 #system is running from the command line, and password echo can be off
                 pw = getpass.getpass(prompt='    MySQL password: ')
 
+            self.sql_store = MySQLBackend(self.sql_server_name, un, pw) #keeps the login, so the pool can open further connections with it
             try:
-                self.sql_connection = pymysql.connect(host=self.sql_server_name, db='nccs', user=un, password=pw)
+                self.sql_connection = self.sql_connect()
             except pymysql.OperationalError:
                 self.main.logger.info('    failed to connect to server; will try to load from downloads/nccs folder.\n')
                 self.sql_connection = None
             else:
+                self.sql_pool = SQLPool(self.sql_connect, self.sql_workers, first=self.sql_connection)
                 self.main.logger.info('    login successful, will attempt to retrieve all necessary data from the SQL database.\n')
         else:
             self.main.logger.info('Without logging into NCCS MySQL server, will look for all files in downloads/nccs folder.\n')
             self.sql_connection = None
 
+    def sql_connect(self):
+        """
+        Opens a new connection to the data store chosen in the sql_auth method.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        Connection
+        """
+        return self.sql_store.connect()
+
     def close_sql(self):
         """
-        Cleanly shuts down the NCCS MySQL connection.
+        Cleanly shuts down the NCCS MySQL connection, along with any others opened for the pool, and logs the
+        counters of the SQL cache.
 
         ARGUMENTS
         None
@@ -192,11 +606,16 @@ class LoadData():
         RETURNS
         None
         """
-        if self.get_from_sql:
+        stats = self.sql_cache.stats()
+        self.main.logger.info('SQL cache: {hits} hits, {misses} misses, {evictions} evictions ({spills} spilled to disk), {bytes} bytes in memory.'.format(**stats))
+        if self.sql_connection is not None:
             self.main.logger.info('Cosing MySQL connection.')
-            self.sql_connection.close()
+            if self.sql_pool is not None:
+                self.sql_pool.close() #the pool includes self.sql_connection
+            else:
+                self.sql_connection.close()
 
-    def get_sql(self, fname, dbase, cols='*', index_col='EIN', match_dtypes=None, force_sql_cols=False):
+    def get_sql(self, fname, dbase, cols='*', index_col='EIN', match_dtypes=None, force_sql_cols=False, eins=None, exclude_eins=False, missing_ok=False, con=None):
         """
         Method for downloading a file, passed as the "fname" argument, from the MySQL connection established
         in the sql_auth method.
@@ -215,90 +634,518 @@ class LoadData():
         match_dtypes (DataFrame): Default None, if a dataframe is passed it will extract the schema from
                                   it and apply it to the data specified in fname; otherwise it uses the
                                   MySQL defaults.
-        force_sql_cols (bool): Default False, If True it will force the columns specified in the cols argument
-                               to become a part of the SQL statement; otherwise it downloads * in the SELECT
-                               statement and then subsets it later.  This is used, for example, in
-                               nteedocAllEINS because the full file is 1.5 gigabytes but only 1/3rd of that is
-                               needed.
+        force_sql_cols (bool): Default False.  The SELECT statement always names only the columns in the cols
+                               argument that the table has (see sql_table_columns).  With the sql_write_through
+                               setting on, every other column is retrieved as well, unless this is True; such a
+                               partial table is then saved to the "downloads/nccs" folder as it is.  This is used,
+                               for example, in nteedocAllEINS because the full file is 1.5 gigabytes but only 1/3rd
+                               of that is needed.
+        eins (Index): Default None, if given (and the sql_semijoin setting is on) only the rows for these EINs are
+                      retrieved, by joining the table against a temporary table of the EINs.  A filtered result is
+                      cached in memory under its own key, and not saved to the "downloads/nccs" folder since it is
+                      not the whole table, so with the sql_write_through setting on (and a remote data store) the
+                      whole table is retrieved and saved instead.  A file already in that folder is used whole.
+        exclude_eins (bool): Default False, if True only the rows for EINs NOT in eins are retrieved.
+        missing_ok (bool): Default False, if True any of the cols the table does not have are left out; otherwise
+                           they raise a KeyError.  Column names are matched regardless of case.
+        con (Connection): Default None, the MySQL connection to use; None uses the one from sql_auth.  The
+                          prefetch_sql method passes a connection from the pool for each table it fetches.
         RETURNS
         DataFrame
         """
         file_path = os.path.join(self.main.path, self.nccs_download_folder)
-        existing_downloads = os.listdir(file_path)
-        existing_downloads = [f for f in existing_downloads if f.endswith('.csv')]
+        local = self.local_sql_file(fname)
+
+        #a table that has to come from MySQL is retrieved whole, so it can be saved to downloads/nccs for later runs
+        write_through = self.sql_write_through and self.sql_store is not None and self.sql_store.remote and local is None
+        if eins is None or not self.sql_semijoin or fname in self.sql_cache or local is not None or write_through:
+            eins = None #filtering only applies when the table has to come from MySQL
+        if cols == '*' or force_sql_cols:
+            cache_key = self.sql_cache_key(fname, '*', eins, exclude_eins)
+        else:
+            cache_key = self.sql_cache_key(fname, cols, eins, exclude_eins)
+
+        if cache_key != fname and cache_key in self.sql_cache:
+            self.main.logger.info('File already cached for these columns and EINs; using version in memory.')
+            return self.subset_sql(fname, self.sql_cache[cache_key], cols, match_dtypes, missing_ok)
 
         if fname in self.sql_cache:
             self.main.logger.info('File already cached; trying version in memory.')
+            cached = self.sql_cache[fname]
             if isinstance(cols, list):
-                try:
-                    return self.sql_cache[fname][cols]
-                except KeyError:
-                    self.main.logger.info('    Specified columns not in memory.')
-                    pass #if the dataframe is cached already but the desired cols are missing, continue with sql loading
+                missing = [c.upper() for c in cols if c.upper() != 'EIN' and c.upper() not in cached.columns]
+                if len(missing) == 0 or fname not in self.sql_partial:
+                    return self.subset_sql(fname, cached, cols, match_dtypes, missing_ok) #a whole table that lacks some columns simply doesn't have them
+                self.main.logger.info('    Specified columns not in memory.')
+                #if the dataframe is cached already but the desired cols are missing, continue with sql loading
             else:
-                return self.sql_cache[fname]
+                return self.subset_sql(fname, cached, cols, match_dtypes, missing_ok)
 
-        if fname+'.csv' in existing_downloads:
+        if local is not None:
             self.main.logger.info('File found in NCCS downloads; using already-downloaded version.')
-
-            if match_dtypes is not None:
-                dtype = match_dtypes.dtypes.to_dict()
-                dtype['EIN'] = 'str'
-            else:
-                dtype = 'str'
-
-            df = pd.read_csv(os.path.join(file_path, fname+'.csv'), dtype=dtype, low_memory=False, encoding='utf-8')
-            if index_col is not None: df.set_index(index_col, inplace=True)
-
-            if match_dtypes is None:
-                num_cols = [c for c in self.numeric_columns if c in df]
-                for col in num_cols:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) #recast the str columns to float64 or int64
-                str_cols = df.select_dtypes(include=[np.object_]).columns.values #fill string NA columns with empty strings
-                df.loc[:, str_cols] = df.loc[:, str_cols].fillna('')
+            df, cache_key = self.load_local_sql(fname, local, cols, index_col, match_dtypes, force_sql_cols)
 
         elif self.sql_connection is not None:
-            con = self.sql_connection
+            if con is None:
+                con = self.sql_connection
             con.select_db(dbase)
-            if force_sql_cols:
-                sql_cols = ', '.join(cols)
+
+            #the SELECT always names its columns: those requested that the table actually has, or all of them to save the table
+            table_cols = self.sql_table_columns(fname, dbase, con)
+            if cols == '*' or (write_through and not force_sql_cols):
+                selected = table_cols
+            else:
+                wanted = set([c.upper() for c in cols] + ([index_col.upper()] if index_col is not None else []))
+                selected = [c for c in table_cols if c.upper() in wanted]
+            whole = len(selected) == len(table_cols)
+            sql_cols = ', '.join(selected)
+            if not whole:
+                self.main.logger.info('    selecting {} of the {} columns in {}.'.format(len(selected), len(table_cols), fname))
+
+            mirror = False
+            if eins is None:
+                query = 'SELECT {} FROM {}'.format(sql_cols, fname)
+                #partial tables are only saved to downloads/nccs when the columns were forced, as with nteedocAllEins
+                keep = (whole or force_sql_cols) and self.sql_store.remote #nothing is copied from a local data store
+                mirror = keep and self.mirror_available()
+                csv_file = os.path.join(file_path, fname+'.csv') if keep and not mirror else None
+                if whole or force_sql_cols:
+                    cache_key = fname
+                    if not whole:
+                        self.sql_partial.add(fname)
             else:
-                sql_cols = '*'
-            df = pd.read_sql('SELECT {} FROM {}'.format(sql_cols, fname), con=con, index_col=index_col)
-            df.columns = [c.upper() for c in df.columns.values]
+                query = self.sql_filter_query(fname, sql_cols, eins, exclude_eins, con)
+                csv_file = None #only part of the table, so it is not written to downloads/nccs
 
             if match_dtypes is not None:
                 self.main.logger.info('    standardizing dtypes for {}...'.format(fname))
 
-                def _dtype_matcher(c):
-                    if c.name in match_dtypes.columns:
-                        desired_type = match_dtypes[c.name].dtype.type
-                        if desired_type is np.object_:
-                            return c.astype(str)
-                        elif desired_type in [np.float64, np.int64, np.float32, np.int32]:
-                            return pd.to_numeric(c, errors='coerce').fillna(0)
-                        else:
-                            return c.astype(str) #assume strings for anything else (e.g. dates)
-                            #raise Exception('Unknown dtype: {}, {}'.format(c.name, desired_type))
-                    else:
-                        return c.astype(str)
-
-                df = df.apply(_dtype_matcher) #this is not very efficient, but I haven't found a better way to make sure all dtypes match from SQL
-
-            df.to_csv(os.path.join(file_path, fname+'.csv'), index=df.index.name is not None)
+            if self.sql_chunksize is not None:
+                df = self.stream_sql(query, csv_file, index_col, match_dtypes, con)
+            else:
+                df = pd.read_sql(query, con=self.sql_store.dbapi_connection(con), index_col=index_col)
+                df.columns = [c.upper() for c in df.columns.values]
+                if match_dtypes is not None:
+                    df = self.cast_to_schema(df, self.dtype_schema(match_dtypes))
+                if csv_file is not None:
+                    df.to_csv(csv_file, index=df.index.name is not None)
+            if mirror:
+                self.store_mirror(fname, 'mysql', df)
+
+            if eins is not None:
+                with con.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS {}'.format(self.sql_ein_table))
+                self.main.logger.info('    retrieved {} rows {} the {} EINs given.'.format(len(df), 'outside' if exclude_eins else 'matching', len(eins)))
         else:
             raise Exception('No active connection to NCCS MySQL database, and file not found in downloads/nccs folder: {}'.format(fname))
 
-        self.sql_cache[fname] = df #save all dataframes loaded from sql in case they are needed later, because sql load times are slow
+        if index_col is not None and index_col.upper() == 'EIN':
+            #the copies in downloads/nccs keep the EINs as they are in the database; in memory they are int64
+            df = convert_eins(df, self.main.logger, fname, column=None)
+
+        self.sql_cache[cache_key] = df #save all dataframes loaded from sql in case they are needed later, because sql load times are slow
+
+        return self.subset_sql(fname, df, cols, missing_ok=missing_ok)
+
+    def local_sql_file(self, fname):
+        """
+        Finds the local copy of a table in the "downloads/nccs" folder, if there is one.  The Parquet mirror
+        (see store_mirror) is used if it is current; a CSV file placed in the folder by hand replaces a mirror
+        made from an older version of it, or from MySQL.  With the local SQLite data store the folder is not
+        used, since the store was loaded from it.
+
+        ARGUMENTS
+        fname (str) : Table name
+
+        RETURNS
+        str : 'parquet', 'csv', or None if the table has no local copy
+        """
+        if self.sql_store is not None and not self.sql_store.remote:
+            return None
+        csv_file = os.path.join(self.main.path, self.nccs_download_folder, fname+'.csv')
+        entry = self.nccs_mirror.entries.get(fname)
+        if self.nccs_mirror.available and entry is not None:
+            key = self.mirror_csv_key(csv_file) if os.path.exists(csv_file) else entry['key']
+            if self.nccs_mirror.get(fname, key) is not None:
+                return 'parquet'
+        if os.path.exists(csv_file):
+            return 'csv'
+        return None
+
+    def mirror_available(self):
+        """
+        Returns True if tables are to be mirrored in Parquet: the sql_mirror setting is on and pyarrow is installed.
+        """
+        return self.sql_mirror and self.nccs_mirror.available
+
+    def mirror_csv_key(self, csv_file):
+        """
+        Builds the mirror key for a CSV file in the "downloads/nccs" folder, from its size and modification time,
+        so a mirror is only used while the CSV it was made from is unchanged.
+        """
+        stat = os.stat(csv_file)
+        return 'csv:{}:{}'.format(stat.st_size, int(stat.st_mtime))
+
+    def store_mirror(self, fname, key, df):
+        """
+        Saves a table to the Parquet mirror in the "downloads/nccs" folder, with the index (usually EIN) as an
+        ordinary column.  If the table can't be written as Parquet (e.g. a column mixes numbers and text), a CSV
+        copy is written instead when the table came from MySQL.
+
+        ARGUMENTS
+        fname (str) : Table name
+        key (str) : 'mysql', or the mirror_csv_key of the CSV file the table was read from
+        df (DataFrame) : The table
+
+        RETURNS
+        None
+        """
+        try:
+            self.nccs_mirror.store(fname, key, df.reset_index() if df.index.name is not None else df)
+        except pa.ArrowException as e:
+            self.main.logger.info('    could not mirror {} as Parquet ({}).'.format(fname, e))
+            if key == 'mysql':
+                df.to_csv(os.path.join(self.main.path, self.nccs_download_folder, fname+'.csv'), index=df.index.name is not None)
+
+    def load_local_sql(self, fname, local, cols, index_col, match_dtypes, force_sql_cols):
+        """
+        Loads a table for get_sql from its local copy in the "downloads/nccs" folder.
+
+        From the Parquet mirror only the requested columns are read, with the types they were saved with.  A
+        CSV file is read as text; if the sql_mirror setting is on it is then saved to the mirror, so later runs
+        can skip parsing it.  Tables that started out as CSV text are then typed the same way whichever copy
+        they came from: cast to match_dtypes if it is given, otherwise with the numeric_columns made numbers
+        and empty strings in place of missing text.
+
+        ARGUMENTS
+        fname (str) : Table name
+        local (str) : 'parquet' or 'csv', from local_sql_file
+        cols (str or list) : '*' for all columns, or a list of column names
+        index_col (str) : Column to use as the index, or None
+        match_dtypes (DataFrame) : Dataframe to take the dtypes from, or None
+        force_sql_cols (bool) : If True the whole local copy is loaded, as it is cached under the table name
+
+        RETURNS
+        (DataFrame, str) : The table, and the key to cache it under
+        """
+        file_path = os.path.join(self.main.path, self.nccs_download_folder)
+        cache_key = fname #the whole file is loaded
+        if local == 'parquet':
+            entry = self.nccs_mirror.entries[fname]
+            read_cols = None
+            if cols != '*' and not force_sql_cols:
+                wanted = set([c.upper() for c in cols] + ([index_col.upper()] if index_col is not None else []))
+                read_cols = [c for c in entry['columns'] if c.upper() in wanted]
+                if len(read_cols) < len(entry['columns']):
+                    cache_key = self.sql_cache_key(fname, cols, None, False)
+                else:
+                    read_cols = None
+            df = self.nccs_mirror.load(fname, entry['key'], read_cols)
+            from_text = entry['key'] != 'mysql'
+
+        elif self.mirror_available():
+            csv_file = os.path.join(file_path, fname+'.csv')
+            key = self.mirror_csv_key(csv_file)
+            df = pd.read_csv(csv_file, dtype='str', low_memory=False, encoding='utf-8')
+            self.store_mirror(fname, key, df)
+            from_text = True
+
+        else:
+            if match_dtypes is not None:
+                #string columns are read as str, and numeric ones are left to the parser, then cast as for MySQL
+                schema = self.dtype_schema(match_dtypes)
+                header = pd.read_csv(os.path.join(file_path, fname+'.csv'), nrows=0, encoding='utf-8').columns
+                dtype = {c:'str' for c in header if schema.get(c) != 'numeric'}
+            else:
+                dtype = 'str'
+            df = pd.read_csv(os.path.join(file_path, fname+'.csv'), dtype=dtype, low_memory=False, encoding='utf-8')
+            from_text = True
+
+        df.columns = [c.upper() for c in df.columns] #as for tables from MySQL, whatever the case of the file's header
+        if index_col is not None: df.set_index(index_col.upper(), inplace=True)
+
+        if match_dtypes is not None:
+            df = self.cast_to_schema(df, self.dtype_schema(match_dtypes))
+        elif from_text:
+            num_cols = [c for c in self.numeric_columns if c in df]
+            for col in num_cols:
+                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) #recast the str columns to float64 or int64
+            str_cols = df.select_dtypes(include=[np.object_]).columns.values #fill string NA columns with empty strings
+            df.loc[:, str_cols] = df.loc[:, str_cols].fillna('')
+
+        return df, cache_key
+
+    def prefetch_sql(self, requests):
+        """
+        Fetches several tables from MySQL at the same time, one per connection from the pool opened in
+        sql_auth, so that the get_sql calls made for them afterwards are answered from self.sql_cache.
+        Each table lands in the cache as soon as its own query finishes.
+
+        Nothing is done without a MySQL connection, or if self.sql_workers is 1; tables already in memory
+        or in the "downloads/nccs" folder are left for get_sql to load as usual.
+
+        ARGUMENTS
+        requests (list) : Dictionaries of keyword arguments for get_sql, one per table
+
+        RETURNS
+        None
+        """
+        if self.sql_pool is None or self.sql_workers < 2:
+            return
+        requests = [r for r in requests if r['fname'] not in self.sql_cache and self.local_sql_file(r['fname']) is None]
+        if len(requests) < 2:
+            return
+
+        self.main.logger.info('Fetching {} tables from MySQL on up to {} connections...'.format(len(requests), self.sql_workers))
+        jobs = {r['fname']:(lambda con, r=r: self.get_sql(con=con, **r)) for r in requests}
+        for fname, _ in self.sql_pool.fetch_all(jobs):
+            self.main.logger.info('    {} fetched.'.format(fname))
+
+    def subset_sql(self, fname, df, cols, match_dtypes=None, missing_ok=False):
+        """
+        Returns the requested columns of a dataframe from get_sql, leaving out EIN (the index), matching their
+        names regardless of case.  A column the table does not have raises a KeyError, unless missing_ok is True,
+        when it is left out.  A table taken from self.sql_cache may have been cast for another caller, so if
+        match_dtypes is given the columns are cast again to its schema, on a copy.
+
+        ARGUMENTS
+        fname (str) : Table name, for the error message
+        df (DataFrame) : Data from get_sql
+        cols (str or list) : '*' for all columns, or a list of column names
+        match_dtypes (DataFrame) : Default None, dataframe to take the dtypes from
+        missing_ok (bool) : Default False, if True columns the table does not have are left out
+
+        RETURNS
+        DataFrame
+        """
+        if cols != '*':
+            names = {c.upper():c for c in df.columns}
+            wanted = [c.upper() for c in cols if c.upper() != 'EIN']
+            missing = [c for c in wanted if c not in names]
+            if len(missing) > 0 and not missing_ok:
+                raise KeyError('Columns not found in {}: {}'.format(fname, missing))
+            df = df.loc[:, [names[c] for c in wanted if c in names]]
+            df.columns = [c.upper() for c in df.columns]
+        if match_dtypes is not None:
+            df = self.cast_to_schema(df.copy(), self.dtype_schema(match_dtypes))
+        return df
+
+    def sql_table_columns(self, fname, dbase, con):
+        """
+        Looks up the columns a table in the data store actually has (for MySQL, from information_schema).
+
+        ARGUMENTS
+        fname (str) : Table name
+        dbase (str) : Database name
+        con (Connection) : MySQL connection
+
+        RETURNS
+        list : Column names, in table order
+        """
+        table_cols = self.sql_store.table_columns(con, fname, dbase)
+        if len(table_cols) == 0:
+            raise Exception('Table {} not found in NCCS database {}.'.format(fname, dbase))
+        return table_cols
+
+    def sql_table_version(self, fname, dbase):
+        """
+        Returns a string identifying the version of a table that get_sql would load: the size and modification
+        time of its CSV file or mirror in the "downloads/nccs" folder if it has one, otherwise what the data store
+        records about it (see the table_version methods of the backends).  Used to tell when a store built from
+        a table, such as the NTEEStore, is out of date.
+
+        ARGUMENTS
+        fname (str) : Table name
+        dbase (str) : Database name
+
+        RETURNS
+        str, or None if the version can't be told
+        """
+        local = self.local_sql_file(fname)
+        if local == 'csv':
+            return self.mirror_csv_key(os.path.join(self.main.path, self.nccs_download_folder, fname+'.csv'))
+        elif local == 'parquet':
+            entry = self.nccs_mirror.entries[fname]
+            if entry['key'] == 'mysql': #mirrored from MySQL, so it changes when the mirror is rewritten
+                return 'mysql:{}'.format(int(os.path.getmtime(os.path.join(self.nccs_mirror.path, entry['file']))))
+            return entry['key']
+        elif self.sql_connection is not None:
+            return self.sql_store.table_version(self.sql_connection, fname, dbase)
+        return None
+
+    def sql_on_disk(self, key):
+        """
+        Returns True if the table cached under the specified key is also saved in the "downloads/nccs" folder,
+        as CSV or in the Parquet mirror, so get_sql can load it from there if the SQLCache evicts it.
+
+        ARGUMENTS
+        key (str) : Cache key, from sql_cache_key
+
+        RETURNS
+        bool
+        """
+        return self.local_sql_file(key) is not None
+
+    def sql_cache_key(self, fname, cols, eins, exclude_eins):
+        """
+        Builds the sql_cache key for a table.  A whole table is cached under its name; a table cut down to
+        some of its columns, or filtered to (or away from) a set of EINs, gets a key with a digest of those.
+
+        ARGUMENTS
+        fname (str) : Table name
+        cols (str or list) : '*', or the columns requested
+        eins (Index) : The EINs the table is filtered on, or None
+        exclude_eins (bool) : True if the rows for the EINs are excluded rather than kept
+
+        RETURNS
+        str
+        """
+        key = fname
+        if cols != '*':
+            key += '_cols_' + hashlib.sha256(','.join(sorted(set([c.upper() for c in cols]))).encode()).hexdigest()[:16]
+        if eins is not None:
+            digest = hashlib.sha256('\n'.join(ein_to_str(np.unique(np.asarray(eins)))).encode()).hexdigest()[:16]
+            key += '_{}_{}'.format('exclude' if exclude_eins else 'match', digest)
+        return key
+
+    def sql_filter_query(self, fname, sql_cols, eins, exclude_eins, con):
+        """
+        Loads a set of EINs into a temporary table on the MySQL connection, then builds the query that joins
+        the specified table against it: an inner join keeps only the rows for those EINs, and a left join on
+        which nothing matched keeps only the rows for other EINs.  The temporary table is dropped by get_sql
+        once the query has been run.
+
+        ARGUMENTS
+        fname (str) : Table name
+        sql_cols (str) : The columns for the SELECT statement, '*' or comma separated
+        eins (Index) : The EINs to filter on
+        exclude_eins (bool) : True to keep only the rows for EINs not in eins
+        con (Connection) : MySQL connection; temporary tables belong to the connection that made them
+
+        RETURNS
+        str : SQL statement
+        """
+        table = self.sql_ein_table
+        self.sql_store.create_ein_table(con, table, ein_to_str(np.unique(np.asarray(eins))).tolist())
 
-        if cols == '*':
-            return df
+        if sql_cols == '*':
+            select = 't.*'
+        else:
+            select = ', '.join(['t.'+c.strip() for c in sql_cols.split(',')])
+        if exclude_eins:
+            return 'SELECT {} FROM {} t LEFT JOIN {} e ON t.EIN = e.EIN WHERE e.EIN IS NULL'.format(select, fname, table)
         else:
-            return df.loc[:, [c.upper() for c in cols if c.upper() != 'EIN']]
+            return 'SELECT {} FROM {} t INNER JOIN {} e ON t.EIN = e.EIN'.format(select, fname, table)
+
+    def stream_sql(self, query, csv_file, index_col, match_dtypes, con):
+        """
+        Runs a query for get_sql on an unbuffered, server-side cursor, and builds the DataFrame from chunks
+        of self.sql_chunksize rows, so the whole result set is never held in memory as Python tuples.  Each
+        chunk is typed (and matched to match_dtypes) as it arrives, and appended to the CSV copy in the
+        "downloads/nccs" folder, if one is to be kept.
 
-    def download_epostcard(self, usecols=[0, 1], names=['EIN', 'EPOSTCARD'], date_col='EPOSTCARD'):
+        The chunks are typed the same way pd.read_sql types a whole result; where a column was typed
+        differently in different chunks (e.g. integers, but with NULLs in only some chunks) it is retyped
+        over the whole column, and the CSV copy is rewritten from the final frame so it matches exactly.
+
+        ARGUMENTS
+        query (str) : SQL statement
+        csv_file (str) : Location on the local file system for the CSV copy, or None for no copy
+        index_col (str) : Column to use as the index, or None
+        match_dtypes (DataFrame) : Dataframe to take the dtypes from, or None
+        con (Connection) : MySQL connection
+
+        RETURNS
+        DataFrame
+        """
+        temp_file = None if csv_file is None else csv_file + '.part'
+        schema = None if match_dtypes is None else self.dtype_schema(match_dtypes)
+        chunks = []
+        with self.sql_store.stream_cursor(con) as cursor:
+            cursor.execute(query)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchmany(self.sql_chunksize)
+            while len(rows) > 0 or len(chunks) == 0:
+                chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                if index_col is not None: chunk.set_index(index_col, inplace=True)
+                chunk.columns = [c.upper() for c in chunk.columns.values]
+                if schema is not None:
+                    chunk = self.cast_to_schema(chunk, schema)
+                if csv_file is not None:
+                    chunk.to_csv(temp_file, mode='a' if chunks else 'w', header=len(chunks) == 0, index=chunk.index.name is not None)
+                chunks.append(chunk)
+                rows = cursor.fetchmany(self.sql_chunksize)
+
+        df = pd.concat(chunks, ignore_index=index_col is None)
+        mixed = [c for c in df.columns if any(chunk[c].dtype != chunks[0][c].dtype for chunk in chunks)]
+        for col in mixed:
+            df[col] = pd.Series(df[col].tolist(), index=df.index)
+        if csv_file is not None:
+            if len(mixed) > 0:
+                df.to_csv(temp_file, index=df.index.name is not None)
+            os.replace(temp_file, csv_file)
+
+        self.main.logger.info('    fetched {} rows in {} chunks.'.format(len(df), len(chunks)))
+        return df
+
+    def dtype_schema(self, match_dtypes):
+        """
+        Builds the target schema for data retrieved by get_sql from the dtypes of another dataframe, once per
+        table: numeric for float and int columns, and strings for object columns and anything else non-numeric
+        (e.g. dates).  Columns not in match_dtypes are also strings.
+
+        ARGUMENTS
+        match_dtypes (DataFrame) : Dataframe to take the dtypes from
+
+        RETURNS
+        dict : {column name: 'numeric' or 'str'}
+        """
+        numeric_types = [np.float64, np.int64, np.float32, np.int32]
+        return {col:'numeric' if dtype.type in numeric_types else 'str' for col, dtype in match_dtypes.dtypes.items()}
+
+    def cast_to_schema(self, df, schema):
+        """
+        Casts data retrieved from MySQL or from the "downloads/nccs" folder to a schema from dtype_schema, so
+        both sources give the same frame.  Numeric columns are converted to numbers, with missing values
+        filled with 0; string columns are converted to str, with missing values left as NaN.  Columns that
+        already have the right type (e.g. VARCHAR columns from MySQL, or numbers parsed from the CSV) are not
+        converted again.
+
+        ARGUMENTS
+        df (DataFrame) : Data retrieved by get_sql
+        schema (dict) : {column name: 'numeric' or 'str'}, from dtype_schema
+
+        RETURNS
+        DataFrame
+        """
+        num_cols = [c for c in df.columns if schema.get(c) == 'numeric']
+        str_cols = [c for c in df.columns if schema.get(c) != 'numeric']
+
+        for col in num_cols:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        if len(num_cols) > 0:
+            df[num_cols] = df[num_cols].fillna(0)
+
+        already_str = []
+        for col in str_cols:
+            if df[col].dtype == np.object_ and pd.api.types.infer_dtype(df[col], skipna=True) == 'string':
+                already_str.append(col)
+            else:
+                df[col] = df[col].astype(str).where(df[col].notnull(), np.nan)
+        if len(already_str) > 0:
+            df[already_str] = df[already_str].where(df[already_str].notnull(), np.nan) #NULLs from MySQL come back as None
+
+        return df
+
+    def download_epostcard(self, usecols=[0, 1], names=['EIN', 'EPOSTCARD'], date_col='EPOSTCARD', eins=None):
         """
-        Method for downloading the epostcard (990N) data from the IRS.
+        Method for downloading the epostcard (990N) data from the IRS.  If a set of EINs is given, the file is
+        read in chunks of self.parse_chunksize rows and only the rows for those EINs are kept.
+
+        If the epostcard_index setting is on (and pyarrow is installed), the EIN and year columns of the whole
+        file are kept in the parsed cache (see parse_cache.py) after the first read, keyed on the SHA-256 of
+        the download, and later runs filter that instead of reading the file again.
 
         ARGUMENTS
         usecols (list) : Default [0, 1], this data comes without headers, so the subset needed is given as
@@ -306,48 +1153,108 @@ class LoadData():
         names (list) : Default ['EIN', 'EPOSTCARD'], provides the header names.  Must be the same dimension
                        as usecols.
         date_col (str) : Default 'EPOSTCARD', specifies the column to be converted to date dtype.
+        eins (Index) : Default None, the EINs to keep; None keeps every row
 
         RETURNS
         DataFrame
         """
         url = self.urls['epostcard']
         delim = self.epostcard_delim
-        #a df of 'EIN', 'YEAR' from the epostcard records
-        df = pd.read_csv(self.download_file(url, force=True),
-                          skip_blank_lines=True,
-                          sep=delim,
-                          usecols=usecols,
-                          names=names,
-                          dtype='str')
+        output_file = self.download_file(url, force=True)
+
+        if self.epostcard_index and self.parse_cache.available:
+            fname = os.path.basename(output_file)
+            key = '{}-{}'.format(self.source_sha256(url, output_file), '-'.join(names))
+            df = self.parse_cache.load(fname, key)
+            if df is None:
+                with self.open_download(output_file) as f:
+                    df = self.read_csv(f, skip_blank_lines=True, sep=delim, usecols=usecols, names=names, dtype='str')
+                self.parse_cache.store(fname, key, df)
+            else:
+                self.main.logger.info('Epostcard EINs loaded from the index in the parsed cache.')
+            df = convert_eins(df, self.main.logger, 'the epostcard data')
+            if eins is not None:
+                df = df[df['EIN'].isin(eins)]
+        else:
+            #a df of 'EIN', 'YEAR' from the epostcard records
+            with self.open_download(output_file) as f:
+                if eins is None:
+                    df = self.read_csv(f,
+                                       skip_blank_lines=True,
+                                       sep=delim,
+                                       usecols=usecols,
+                                       names=names,
+                                       dtype='str')
+                    df = convert_eins(df, self.main.logger, 'the epostcard data')
+                else:
+                    kept = []
+                    for chunk in self.read_csv(f, skip_blank_lines=True, sep=delim, usecols=usecols, names=names,
+                                               dtype='str', chunksize=self.parse_chunksize):
+                        chunk = convert_eins(chunk, self.main.logger, 'the epostcard data')
+                        kept.append(chunk[chunk['EIN'].isin(eins)])
+                    df = pd.concat(kept)
+
         df.set_index('EIN', inplace=True)
         df = df[df[date_col] != ''] #drop null dates
         assert(df.index.is_unique), 'Expected unique EINs in epostcard data.'
         return df
 
-    def download_bmf(self):
+    def download_bmf(self, eins=None):
         """
         Accesses the stored URLs for the raw BMF files from the IRS, then passes the necessary information
-        into the download_file method.
+        into the download_file method.  If a set of EINs is given, each region is read in chunks of
+        self.parse_chunksize rows and only the rows for those EINs are kept, so the full BMF is never held
+        in memory at once.
 
         ARGUMENTS
-        None
+        eins (Index) : Default None, the EINs to keep; None keeps every row
 
         RETURNS
         DataFrame
         """
         bmf_data = {}
         delim = self.bmf_delim
-        for region in self.urls['BMF'].keys():
-            url = self.urls['BMF'][region]
-            bmf_data[region] = pd.read_csv(self.download_file(url), sep=delim, dtype='str')
-        df = pd.concat(bmf_data).set_index('EIN')
+        regions = {url:region for region, url in self.urls['BMF'].items()}
+        for url, output_file in self.downloads.as_completed(list(regions.keys())):
+            with self.open_download(output_file) as f:
+                if eins is None:
+                    bmf_data[regions[url]] = self.read_csv(f, sep=delim, dtype='str')
+                    bmf_data[regions[url]] = convert_eins(bmf_data[regions[url]], self.main.logger, 'BMF {}'.format(regions[url]))
+                else:
+                    kept, total = [], 0
+                    for chunk in self.read_csv(f, sep=delim, dtype='str', chunksize=self.parse_chunksize):
+                        total += len(chunk)
+                        chunk = convert_eins(chunk, self.main.logger, 'BMF {}'.format(regions[url]))
+                        kept.append(chunk[chunk['EIN'].isin(eins)])
+                    bmf_data[regions[url]] = pd.concat(kept)
+                    self.main.logger.info('Kept {} of {} rows from BMF {}.'.format(len(bmf_data[regions[url]]), total, regions[url]))
+        df = pd.concat([bmf_data[region] for region in self.urls['BMF'].keys()]).set_index('EIN')
         assert(df.index.is_unique), 'Expected unique EINs in BMF data.'
         return df
 
     def download_file(self, url, force=False):
         """
-        Method for downloading the specified URL, then unzipping it if necessary.  All newly-downloaded
-        files are set to read-only.
+        Method for downloading the specified URL.  If the download was already started in the background
+        by the download manager (see start_downloads), this waits for it to finish; otherwise it downloads
+        the file directly with the fetch_file method.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        force (bool) : Default False, when True it will ignore existing files in the "downloads/IRS" folder,
+                       when False it will only download a new version if the file does not already exist.
+
+        RETURNS
+        str : Location on local file system of the downloaded (or pre-existing) file.
+        """
+        if self.downloads.started(url):
+            return self.downloads.result(url)
+        return self.fetch_file(url, force)
+
+    def fetch_file(self, url, force=False):
+        """
+        Method for downloading the specified URL.  All newly-downloaded files are set to read-only.  The
+        transfer itself is handled by stream_file, which writes in chunks and resumes interrupted downloads.
+        This is what runs on the download manager's threads.  Zip files are not extracted; see open_download.
 
         ARGUMENTS
         url (str) : Any valid URL
@@ -364,42 +1271,170 @@ class LoadData():
         output_file = os.path.join(output_path, fname) #full location of file to write to
 
         if main.force_new_download or force or not os.path.exists(output_file):
-            r = requests.get(url, headers=self.headers)
+            #the manifest is bypassed when the user asks for new downloads, so every file is re-transferred
+            modified = self.stream_file(url, output_file, conditional=not main.force_new_download)
+            if not modified:
+                main.logger.info('File {} unchanged on the IRS server; using existing contents in downloads.'.format(fname))
+                return output_file
+            main.logger.info('File {} downloaded.'.format(fname))
+
+            #zipped downloads are left compressed; open_download streams the data out of them when parsing
+            return output_file
+        else:
+            main.logger.info('Using existing contents of {} in downloads.'.format(fname))
+            return output_file
+
+    @contextlib.contextmanager
+    def open_download(self, output_file):
+        """
+        Opens a downloaded file for parsing.  If it is a zip archive, the data file inside it is streamed
+        straight out of the archive instead of being extracted to disk first, so the uncompressed copy is
+        never written and decompression happens as the parser reads.  Used as a context manager:
+
+            with self.open_download(output_file) as f:
+                df = pd.read_csv(f, ...)
+
+        ARGUMENTS
+        output_file (str) : Location on the local file system of the download
+
+        RETURNS
+        File object (binary)
+        """
+        if zipfile.is_zipfile(output_file):
+            with zipfile.ZipFile(output_file, 'r') as zip_ref:
+                members = [m for m in zip_ref.infolist() if not m.filename.endswith('/')]
+                if len(members) != 1:
+                    self.main.logger.info('WARNING: More or less than one file in {}; system may not be using the right one as data.'.format(os.path.basename(output_file)))
+                member = max(members, key=lambda m: m.file_size) #the data is the largest file in the archive
+                self.main.logger.info('Reading {} directly from {}.'.format(member.filename, os.path.basename(output_file)))
+                with zip_ref.open(member) as f:
+                    yield f
+        else:
+            with open(output_file, 'rb') as f:
+                yield f
+
+    def stream_file(self, url, output_file, conditional=True, pipe=None):
+        """
+        Streams the specified URL to disk in fixed-size chunks (set by self.download_chunk_size), so memory
+        use stays flat no matter how large the file is.  The transfer is written to a ".part" file next to
+        the final location, with the ETag and Last-Modified values of the file it is a part of kept beside it
+        (see part_validator).  If one is left over from an interrupted run, only the remaining bytes are
+        requested with an HTTP Range header and appended to it; the request carries an If-Range header, so
+        if the file has changed on the IRS server since, the server sends the whole new file instead and the
+        download starts over.  Once complete the ".part" file is renamed into place, set to read-only,
+        recorded in the download manifest, and the throughput is logged.
+
+        If the manifest says the existing local copy came from this URL, the request is made conditional on
+        its ETag and Last-Modified values, and nothing is transferred if the IRS has not changed the file.
+
+        ARGUMENTS
+        url (str) : Any valid URL
+        output_file (str) : Location on the local file system to write the download to
+        conditional (bool) : Default True, when False the manifest is ignored and the file always transferred
+        pipe (DownloadPipe) : Default None, if given every chunk written to disk is also passed into it, for
+                              parsing while the download is still in progress (see download_form)
+
+        RETURNS
+        bool : False if the server reported the existing local copy is still current, otherwise True
+        """
+        main = self.main
+        fname = os.path.basename(output_file)
+        part_file = output_file + '.part'
+        validator_file = part_file + '.json'
+
+        headers = {}
+        resume_from = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        validator = self.part_validator(validator_file) if resume_from > 0 else None
+        if resume_from > 0 and validator is None:
+            #nothing tells which version of the file the partial download came from, so it can't be resumed
+            main.logger.info('Partial download of {} has no ETag or Last-Modified recorded; restarting.'.format(fname))
+            os.remove(part_file)
+            resume_from = 0
+        if resume_from > 0:
+            headers['Range'] = 'bytes={}-'.format(resume_from)
+            headers['If-Range'] = validator
+        elif conditional:
+            headers.update(self.manifest.conditional_headers(url, output_file))
+
+        start = time.time()
+        with self.downloads.session.get(url, headers=headers, stream=True, timeout=self.download_timeout) as r:
+            if r.status_code == 416:
+                #the server can't satisfy the range, so the partial file is stale; discard it and start over
+                main.logger.info('Partial download of {} could not be resumed; restarting.'.format(fname))
+                os.remove(part_file)
+                os.remove(validator_file)
+                return self.stream_file(url, output_file, conditional, pipe=pipe)
+            if r.status_code == 304:
+                return False
+            r.raise_for_status()
 
             #this catches invalid URLs entered into the url text files: the IRS website returns a
             #page saying "404 error code" but since that page is a valid page, it returns an actual
             #success code of 200.  Simply searching for 'Page Not Found' in the body is very slow
             #when it is an actual download link with a large file, so it first checks the headers
             #to make sure it's not ['Content-Type'] = 'application/zip'
-            if 'text/html' in r.headers['Content-Type'] and 'Page Not Found' in r.text:
-                raise Exception('Warning: the url {} appears to be invalid.')
-
-            with open(output_file, 'wb') as ofile:
-                ofile.write(r.content)
-                os.chmod(output_file, S_IREAD|S_IRGRP|S_IROTH) #sets the download to read-only
-            main.logger.info('File {} downloaded.'.format(fname))
-
-            if fname.endswith('.zip'):
-                zip_ref = zipfile.ZipFile(output_file, 'r')
-                zip_ref.extractall(output_path+os.sep) #unzips into the download path
+            if 'text/html' in r.headers.get('Content-Type', '') and 'Page Not Found' in r.text:
+                raise Exception('Warning: the url {} appears to be invalid.'.format(url))
 
-                #looks at the list of unizpped items, warns if there is more than 1
-                unzipped_files = zip_ref.namelist()
-                zip_ref.close() #finished with the zip object
-                if len(unzipped_files) != 1:
-                    main.logger.info('WARNING: More or less than one file in {}; system may not be using the right one as data.'.format(fname))
+            if r.status_code == 206:
+                main.logger.info('Resuming download of {} from byte {}.'.format(fname, resume_from))
+                mode = 'ab'
+            else:
+                #a plain 200 means the server ignored the range request, or the file has changed since the
+                #partial download, and it is sending the whole file
+                if resume_from > 0:
+                    main.logger.info('File {} changed on the IRS server since the partial download; restarting.'.format(fname))
+                resume_from = 0
+                mode = 'wb'
+                with open(validator_file, 'w') as f:
+                    json.dump({'etag':r.headers.get('ETag'), 'last_modified':r.headers.get('Last-Modified')}, f)
+
+            sha256 = hashlib.sha256()
+            if mode == 'ab':
+                with open(part_file, 'rb') as pfile:
+                    for chunk in iter(lambda: pfile.read(self.download_chunk_size), b''):
+                        sha256.update(chunk)
+                        if pipe is not None:
+                            pipe.feed(chunk)
+
+            received = 0
+            with open(part_file, mode) as ofile:
+                for chunk in r.iter_content(chunk_size=self.download_chunk_size):
+                    ofile.write(chunk)
+                    sha256.update(chunk)
+                    received += len(chunk)
+                    if pipe is not None:
+                        pipe.feed(chunk)
+            response_headers = r.headers
+
+        if os.path.exists(output_file):
+            os.chmod(output_file, S_IREAD|S_IWRITE) #earlier downloads are read-only, which blocks replacing them
+        os.replace(part_file, output_file)
+        os.remove(validator_file)
+        os.chmod(output_file, S_IREAD|S_IRGRP|S_IROTH) #sets the download to read-only
+        self.manifest.record(url, output_file, response_headers, resume_from + received, sha256.hexdigest())
+
+        elapsed = max(time.time() - start, 1e-6)
+        main.logger.info('    received {:.1f} MB in {:.1f} seconds ({:.2f} MB/s).'.format(received/1e6, elapsed, received/1e6/elapsed))
+        return True
+
+    def part_validator(self, validator_file):
+        """
+        Reads the ETag and Last-Modified values recorded for a partial download by stream_file, and returns the
+        one to send in an If-Range header: the ETag, unless it is a weak one (which If-Range can't use), and
+        otherwise the Last-Modified date.
 
-                #sets the unzipped files to read-only
-                for nfile in unzipped_files:
-                    output_file = os.path.join(output_path, nfile)
-                    os.chmod(output_file, S_IREAD|S_IRGRP|S_IROTH)
-                    main.logger.info('File {} extracted from zip.'.format(nfile))
+        ARGUMENTS
+        validator_file (str) : Location on the local file system of the record, next to the ".part" file
 
-                    #returns the contents of a zip file as the output file
-                    return output_file
-            else:
-                #returns the output file if it's not zipped
-                return output_file
-        else:
-            main.logger.info('Using existing contents of {} in downloads.'.format(fname))
-            return output_file
+        RETURNS
+        str, or None if there is no record or it holds neither value
+        """
+        if not os.path.exists(validator_file):
+            return None
+        with open(validator_file, 'r') as f:
+            validator = json.load(f)
+        etag = validator.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return validator.get('last_modified')
@@ -21,6 +21,9 @@ tolerance = 1000 #the amount column validation can be off by before it flags it
 clear_old = True #drops the downloaded source data after backfilling; True will reduce system memory usage significantly, False will allow the user to query the old data after the program runs
 get_from_sql = True #if True, will attempt to get the fipsmsa and ntee files from the NCCS data store (un and pw required)
 output_full = True #if True, will also output the CO_full and PC_full files at the end
+parser_engine = 'c' #'c' parses the IRS files on one core; 'pyarrow' uses every core, but requires the pyarrow package
+sql_cache_bytes = None #memory budget in bytes for tables kept from the NCCS data store (e.g. 4*1024**3); None keeps every table in memory
+sql_backend = 'mysql' #'mysql' for the NCCS MySQL server; 'sqlite' for a local stand-in loaded from the tables in downloads/nccs, with no login needed
 ###############################################################################
 
 
@@ -34,20 +37,22 @@ if __name__ == '__main__':
                                 tolerance=tolerance,
                                 partial_validation=partial_validation,
                                 get_from_sql=get_from_sql,
-                                output_full=output_full
+                                output_full=output_full,
+                                parser_engine=parser_engine,
+                                sql_cache_bytes=sql_cache_bytes,
+                                sql_backend=sql_backend
                                 )
 
     nccs.data.get_urls()
+    nccs.data.start_downloads()
     nccs.data.sql_auth()
     nccs.data.download()
     nccs.data.apply_crosswalk()
     nccs.data.drop_missing()
     nccs.data.drop_on_values()
     nccs.data.init_final()
-    nccs.data.ntee()
-    nccs.data.fipsmsa()
-    nccs.data.epostcard()
-    nccs.data.bmf()
+    nccs.data.enrich()
+    nccs.data.close_downloads()
     nccs.data.make_numeric()
 
     nccs.process.calculate_columns()
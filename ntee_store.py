@@ -0,0 +1,97 @@
+import os
+import json
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    NTEE_STORE_AVAILABLE = True
+except ImportError:
+    NTEE_STORE_AVAILABLE = False
+
+STORE_FORMAT = 2 #stores built before the EINs were int64 are rebuilt
+
+class NTEEStore():
+    """
+    Keeps the nteedocAllEins data in the "downloads/ntee" folder as a lookup store: the rows sorted by
+    EIN in a Parquet file, and the sorted EINs themselves (as int64, see ein.py) in a numpy array.  It is built once each time the NTEE table changes (see the ntee method of the BMFShare class),
+    after which each run only binary-searches the EINs of its forms in the array and takes those rows from
+    the Parquet file, instead of loading and cleaning the whole table of every EIN in the country.
+
+    The store needs the optional pyarrow package, and is skipped without it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.join(path, 'ntee_store.json')
+        self.table_path = os.path.join(path, 'ntee.parquet')
+        self.eins_path = os.path.join(path, 'ntee_eins.npy')
+        self.available = NTEE_STORE_AVAILABLE
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {}
+
+    def current(self, version):
+        """
+        Returns True if the store was built from the specified version of the NTEE table.
+
+        ARGUMENTS
+        version (str) : From the sql_table_version method of the LoadData class
+
+        RETURNS
+        bool
+        """
+        return (self.available and version is not None and self.meta.get('version') == version
+                and self.meta.get('format') == STORE_FORMAT
+                and os.path.exists(self.table_path) and os.path.exists(self.eins_path))
+
+    def build(self, ntee, version):
+        """
+        Replaces the store with the specified NTEE data.  Rows with the same EIN keep their order.
+
+        ARGUMENTS
+        ntee (DataFrame) : The nteedocAllEins data, indexed by int64 EIN
+        version (str) : From the sql_table_version method of the LoadData class
+
+        RETURNS
+        None
+        """
+        eins = np.asarray(ntee.index.values, dtype=np.int64)
+        order = np.argsort(eins, kind='mergesort') #stable
+        table = pa.Table.from_pandas(ntee.iloc[order].reset_index(), preserve_index=False)
+
+        os.makedirs(self.path, exist_ok=True)
+        pq.write_table(table, self.table_path+'.tmp')
+        os.replace(self.table_path+'.tmp', self.table_path)
+        with open(self.eins_path+'.tmp', 'wb') as f:
+            np.save(f, eins[order])
+        os.replace(self.eins_path+'.tmp', self.eins_path)
+
+        self.meta = {'version':version, 'format':STORE_FORMAT, 'rows':len(eins), 'columns':ntee.columns.tolist()}
+        with open(self.meta_path+'.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(self.meta_path+'.tmp', self.meta_path)
+
+    def lookup(self, eins=None):
+        """
+        Returns the NTEE rows for the specified EINs, every row if there are several for one EIN, in EIN order.
+
+        ARGUMENTS
+        eins (Index) : Default None, the EINs to look up; None returns the whole table
+
+        RETURNS
+        DataFrame : Indexed by EIN
+        """
+        table = pq.read_table(self.table_path, memory_map=True)
+        if eins is not None:
+            keys = np.load(self.eins_path)
+            eins = np.unique(np.asarray(eins, dtype=np.int64))
+            left = np.searchsorted(keys, eins, side='left')
+            counts = np.searchsorted(keys, eins, side='right') - left
+            left, counts = left[counts > 0], counts[counts > 0]
+            #expands each (start, count) pair into start, start+1, ..., start+count-1
+            ends = np.cumsum(counts)
+            positions = np.repeat(left - (ends - counts), counts) + np.arange(ends[-1] if len(ends) > 0 else 0)
+            table = table.take(pa.array(positions, type=pa.int64()))
+        return table.to_pandas().set_index('EIN')
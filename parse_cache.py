@@ -0,0 +1,103 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+class ParseCache():
+    """
+    Keeps the parsed contents of each IRS core file as a Parquet file in the "downloads/parsed" folder, so
+    a file that has not changed since the last run is loaded from there instead of being parsed from text
+    again.  Parquet is columnar, so only the columns the build needs are read back.
+
+    Each entry is keyed on the SHA-256 of the downloaded file and a schema version (see the schema_version
+    method of the LoadData class); if either has changed the entry is ignored and replaced after the file
+    is parsed.  Parquet support needs the optional pyarrow package, and the cache is skipped without it.
+
+    The same class keeps the Parquet mirror of the NCCS tables in the "downloads/nccs" folder (see the
+    load_local_sql method of the LoadData class), with its own index file.
+    """
+    def __init__(self, path, index_name='parsed_index.json'):
+        self.path = path
+        self.index_path = os.path.join(path, index_name)
+        self.lock = threading.Lock()
+        self.available = PARQUET_AVAILABLE
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def get(self, name, key):
+        """
+        Returns the index entry for the specified file if it was cached under the same key, otherwise None.
+
+        ARGUMENTS
+        name (str) : File name of the IRS download, e.g. '15eofinextractEZ.dat'
+        key (str) : Cache key, from the source file hash and schema version
+
+        RETURNS
+        dict or None
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry['key'] != key or not os.path.exists(os.path.join(self.path, entry['file'])):
+            return None
+        return entry
+
+    def load(self, name, key, columns=None):
+        """
+        Reads a cached DataFrame.  String columns come back from Parquet with None for missing values, so
+        they are set back to NaN to match a frame parsed directly from the text file.
+
+        ARGUMENTS
+        name (str) : File name of the IRS download
+        key (str) : Cache key, from the source file hash and schema version
+        columns (list) : Default None, the columns to read; None reads all of them
+
+        RETURNS
+        DataFrame, or None if there is no matching entry
+        """
+        entry = self.get(name, key)
+        if entry is None:
+            return None
+        df = pd.read_parquet(os.path.join(self.path, entry['file']), columns=columns)
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notnull(), np.nan)
+        return df
+
+    def store(self, name, key, df):
+        """
+        Writes a parsed DataFrame to the cache, replacing any older entry for the same file, then saves the index.
+        If a column can't be written as Parquet (e.g. it mixes numbers and text), pyarrow's ArrowException is
+        raised and the cache is left as it was.
+
+        ARGUMENTS
+        name (str) : File name of the IRS download
+        key (str) : Cache key, from the source file hash and schema version
+        df (DataFrame) : The full parse of the file, every column included
+
+        RETURNS
+        None
+        """
+        fname = name + '.parquet'
+        temp_path = os.path.join(self.path, fname + '.tmp')
+        try:
+            df.to_parquet(temp_path, index=False)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, os.path.join(self.path, fname))
+
+        with self.lock:
+            self.entries[name] = {'file':fname, 'key':key, 'columns':df.columns.tolist()}
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.index_path)
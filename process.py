@@ -3,6 +3,7 @@ from process_ez import *
 from process_full import *
 import pandas as pd
 from numpy import random
+from ein import ein_to_str
 import logging
 
 import dask
@@ -69,6 +70,9 @@ class Deduplicate():
         release_year = main.data.core_file_year #an int, e.g. 2005, when the primary FISYR should be 2005
         start_len = len(dups)
         dups, conditions = dup_criteria(dups)
+        for cond in conditions:
+            if isinstance(dups[cond].dtype, pd.SparseDtype): #groupby can't take the max of a sparse column (see Data.sparsify)
+                dups[cond] = dups[cond].sparse.to_dense()
         for cond in conditions:
             if cond == 'FISYR' and form != 'PF':
                 #need to check FISYR for dups, to make sure we avoid the situation where, for example, the prior release was 2014 but the current release has both 2015 and
@@ -270,10 +274,11 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         main = self.main
 
         temp_df = df.reset_index() #pulls EIN out of the index
+        ein = pd.Series(ein_to_str(temp_df['EIN']), index=temp_df.index) #EINs are int64 in the index
 
         #Joins the columns as strings.  Note, TAXPER is tax_prd in IRS original
-        new_col1 = temp_df['EIN'] + temp_df['TAXPER']
-        new_col2 = temp_df['EIN'] + temp_df['FISYR'].astype(str)
+        new_col1 = ein + temp_df['TAXPER']
+        new_col2 = ein + temp_df['FISYR'].astype(str)
 
         #resets the indices back to EIN
         new_col1.index = df.index
@@ -385,7 +390,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, level1)
         else:
-            return df.apply(lambda r: level1(r), axis=1)
+            return df[['SUBSECCD', 'FNDNCD']].apply(lambda r: level1(r), axis=1)
 
     def all_ntmaj10(self, df):
         """
@@ -426,7 +431,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, ntmaj10)
         else:
-            return df.apply(lambda r: ntmaj10(r), axis=1)
+            return df[['NTEEFINAL']].apply(lambda r: ntmaj10(r), axis=1)
 
     def all_majgrpb(self, df):
         """
@@ -453,7 +458,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, majgrpb)
         else:
-            return df.apply(lambda r: majgrpb(r), axis=1)
+            return df[['NTEEFINAL']].apply(lambda r: majgrpb(r), axis=1)
 
     def all_level3(self, df):
         """
@@ -512,7 +517,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, level3)
         else:
-            return df.apply(lambda r: level3(r), axis=1)
+            return df[['NTEEFINAL']].apply(lambda r: level3(r), axis=1)
 
     def all_level2(self, df):
         """
@@ -544,7 +549,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, level2)
         else:
-            return df.apply(lambda r: level2(r), axis=1)
+            return df[['SUBSECCD', 'FNDNCD', 'LEVEL3', 'NTEEFINAL']].apply(lambda r: level2(r), axis=1)
 
     def all_ntmaj12(self, df):
         """
@@ -569,7 +574,7 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, ntmaj12)
         else:
-            return df.apply(lambda r: ntmaj12(r), axis=1)
+            return df[['NTEEFINAL', 'NTMAJ10']].apply(lambda r: ntmaj12(r), axis=1)
 
     def all_ntmaj5(self, df):
         """
@@ -590,4 +595,4 @@ class Process(ProcessPF, ProcessEZ, ProcessFull, Deduplicate):
         if self.parallelize:
             return self.parallel_apply(df, ntmaj5)
         else:
-            return df.apply(lambda r: ntmaj5(r), axis=1)
+            return df[['NTMAJ10']].apply(lambda r: ntmaj5(r), axis=1)
@@ -1,4 +1,5 @@
 import numpy as np
+from ein import ein_to_str
 import logging
 import os
 
@@ -36,7 +37,7 @@ class ProcessCOPC():
             else:
                 return '0'
 
-        return df.apply(lambda r: epostcard(r), axis=1)
+        return df[['FISYR', 'EPOSTCARD']].apply(lambda r: epostcard(r), axis=1)
 
     def copc_styear(self, df):
         """
@@ -56,7 +57,7 @@ class ProcessCOPC():
             else:
                 return int(taxper[:5]) - 1
 
-        return df.apply(lambda r: styear(r), axis=1)
+        return df[['TAXPER']].apply(lambda r: styear(r), axis=1)
 
     def copc_soiyr(self, df):
         """
@@ -77,7 +78,7 @@ class ProcessCOPC():
             else:
                 return str(float(taxper[:5]) - 1)
 
-        return df.apply(lambda r: soiyr(r), axis=1)
+        return df[['TAXPER']].apply(lambda r: soiyr(r), axis=1)
 
     def copc_subcd(self, df):
         """
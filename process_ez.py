@@ -132,7 +132,7 @@ class ProcessEZ(ProcessCOPC):
         RETURNS
         Series
         """
-        return ez.index + '_' + ez['TAXPER'] + '_990EZ'
+        return ein_to_str(ez.index) + '_' + ez['TAXPER'] + '_990EZ'
 
     def ez_manual(self):
         """
@@ -146,8 +146,8 @@ class ProcessEZ(ProcessCOPC):
         None
         """
         try:
-            entry = self.main.data_dict['EZ'].loc['580623603']
-            if entry['SOURCE'] == '16eofinextractez.dat' and entry['NAME'] == 'UNITED WAY OF THE COASTAL EMPIRE INC':
-                self.main.data_dict['EZ'].drop('580623603', inplace=True)
+            entry = self.main.data_dict['EZ'].loc[580623603]
+            if entry['SOURCE'] == '16eofinextractez.dat' and str(entry['NAME']) == 'UNITED WAY OF THE COASTAL EMPIRE INC': #str(), as a missing NAME may be pd.NA (see Data.arrow_text)
+                self.main.data_dict['EZ'].drop(580623603, inplace=True)
         except KeyError:
             pass
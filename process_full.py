@@ -178,7 +178,7 @@ class ProcessFull(ProcessCOPC):
         RETURNS
         Series
         """
-        return full.index + '_' + full['TAXPER'] + '_990O'
+        return ein_to_str(full.index) + '_' + full['TAXPER'] + '_990O'
 
     def full_manual(self):
         """
@@ -195,10 +195,10 @@ class ProcessFull(ProcessCOPC):
 
         #The EIN for this organization(Flying Crown Land Group) is wrong in the validation program; EIN SHOULD BE 453208250
         #-note from Jenny Lee's validation fixing, summer 2017
-        if '453208450' in df.index and df.loc['453208450', 'NAME'] == 'FLYING CROWN LAND GROUP':
-            i = df.index.tolist().index('453208450')
-            # new_index = np.append(df.index.values[:i], [['453208250'], df.index.values[i+1:]])
-            new_index = list(df.index.values[:i]) + ['453208250'] + list(df.index.values[i+1:])
+        if 453208450 in df.index and str(df.loc[453208450, 'NAME']) == 'FLYING CROWN LAND GROUP': #str(), as a missing NAME may be pd.NA (see Data.arrow_text)
+            i = df.index.tolist().index(453208450)
+            # new_index = np.append(df.index.values[:i], [[453208250], df.index.values[i+1:]])
+            new_index = list(df.index.values[:i]) + [453208250] + list(df.index.values[i+1:])
             assert(len(new_index) == len(df.index))
             assert(sum(new_index != df.index) == 1)
             self.main.data_dict['Full'].index = new_index
@@ -0,0 +1,317 @@
+import os
+import sqlite3
+import contextlib
+import threading
+import pymysql
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+class MySQLBackend():
+    """
+    The NCCS MySQL server, the data store the build normally runs against.  The get_sql method of the
+    LoadData class only talks to a data store through the methods below, so the SQLiteBackend can stand in
+    for it.
+
+    Tables retrieved from a remote store are kept in the "downloads/nccs" folder for later runs.
+    """
+    remote = True
+
+    def __init__(self, host, user, password):
+        self.host = host
+        self.user = user
+        self.password = password
+
+    def connect(self):
+        """
+        Opens a new connection to the data store.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        Connection
+        """
+        return pymysql.connect(host=self.host, db='nccs', user=self.user, password=self.password)
+
+    def table_columns(self, con, fname, dbase):
+        """
+        Looks up the columns of a table, in table order; an empty list if the table does not exist.
+
+        ARGUMENTS
+        con (Connection) : Connection from the connect method
+        fname (str) : Table name
+        dbase (str) : Database name
+
+        RETURNS
+        list
+        """
+        with con.cursor() as cursor:
+            cursor.execute('SELECT COLUMN_NAME FROM information_schema.columns WHERE table_schema = %s AND table_name = %s ORDER BY ORDINAL_POSITION', (dbase, fname))
+            return [row[0] for row in cursor.fetchall()]
+
+    def table_version(self, con, fname, dbase):
+        """
+        Returns a string that changes whenever the table is re-created or updated, or None if the server
+        does not record either time.
+
+        ARGUMENTS
+        con (Connection) : Connection from the connect method
+        fname (str) : Table name
+        dbase (str) : Database name
+
+        RETURNS
+        str or None
+        """
+        with con.cursor() as cursor:
+            cursor.execute('SELECT CREATE_TIME, UPDATE_TIME FROM information_schema.tables WHERE table_schema = %s AND table_name = %s', (dbase, fname))
+            row = cursor.fetchone()
+        if row is None or (row[0] is None and row[1] is None):
+            return None
+        return 'mysql:{}:{}'.format(row[0], row[1])
+
+    def create_ein_table(self, con, table, eins):
+        """
+        Creates a temporary table of EINs on the connection, for the get_sql semijoin.
+
+        ARGUMENTS
+        con (Connection) : Connection from the connect method
+        table (str) : Name of the temporary table
+        eins (list) : The EINs, as strings
+
+        RETURNS
+        None
+        """
+        with con.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+            cursor.execute('CREATE TEMPORARY TABLE {} (EIN VARCHAR(9) PRIMARY KEY)'.format(table))
+            cursor.executemany('INSERT INTO {} (EIN) VALUES (%s)'.format(table), [(ein,) for ein in eins])
+
+    def stream_cursor(self, con):
+        """
+        Returns a cursor that fetches rows from the server as they are asked for, rather than all at once.
+        """
+        return con.cursor(pymysql.cursors.SSCursor)
+
+    def dbapi_connection(self, con):
+        """
+        Returns the connection to hand to pd.read_sql.
+        """
+        return con
+
+class SQLiteConnection():
+    """
+    A connection to the SQLiteBackend.  Each NCCS database is its own SQLite file, so this holds one
+    sqlite3 connection per database and, like a pymysql connection, switches between them with select_db.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connections = {}
+        self.current = None
+        self.select_db('nccs')
+
+    def select_db(self, dbase):
+        if dbase not in self.connections:
+            #connections from the pool are handed between threads, though only ever used by one at a time
+            self.connections[dbase] = sqlite3.connect(os.path.join(self.path, dbase+'.db'), check_same_thread=False)
+        self.current = self.connections[dbase]
+
+    def cursor(self):
+        return self.current.cursor(SQLiteCursor)
+
+    def commit(self):
+        self.current.commit()
+
+    def close(self):
+        for con in self.connections.values():
+            con.close()
+        self.connections = {}
+
+class SQLiteCursor(sqlite3.Cursor):
+    """
+    A sqlite3 cursor that can be used in a with statement, as pymysql cursors can.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class SQLiteBackend():
+    """
+    A local stand-in for the NCCS MySQL server, kept as one SQLite file per database in the "downloads/sqlite"
+    folder and bulk-loaded from the tables in the "downloads/nccs" folder, as CSV files or in the Parquet
+    mirror: prior CO releases (coreYYYYco) go in coreco.db, and everything else in nccs.db, as on the server.
+    Each table gets an index on EIN.
+
+    Offline runs then use the same queries as production -- projected to the columns needed and joined
+    against the EINs needed -- and the SQL-side parts of the build can be timed without a server.  Since the
+    store is already local, nothing retrieved from it is saved to the "downloads/nccs" folder.
+    """
+    remote = False
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """
+        Opens a new connection to the data store.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        SQLiteConnection
+        """
+        return SQLiteConnection(self.path)
+
+    def load_folder(self, folder, numeric_columns, logger, mirror=None, chunksize=100000):
+        """
+        Bulk-loads every table in a folder into the store, skipping tables already loaded and unchanged since.
+        Tables are read from their CSV files, or from the Parquet mirror (see the store_mirror method of the
+        LoadData class) if they have no CSV file, as tables retrieved from MySQL are only kept in the mirror.
+        Columns are stored as text, except the numeric_columns of the Data class, which are stored as numbers,
+        so leading zeros in codes and EINs are kept.
+
+        ARGUMENTS
+        folder (str) : Location on the local file system of the tables
+        numeric_columns (list) : Columns to store as numbers
+        logger (Logger) : For progress messages
+        mirror (ParseCache) : Default None, the Parquet mirror of the folder
+        chunksize (int) : Default 100000, rows read from a file and inserted at a time
+
+        RETURNS
+        None
+        """
+        numeric_columns = set(numeric_columns)
+        tables = {f[:-4]:os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.csv')}
+        if mirror is not None and pq is not None:
+            for fname, entry in mirror.entries.items():
+                parquet_file = os.path.join(mirror.path, entry['file'])
+                if fname not in tables and os.path.exists(parquet_file):
+                    tables[fname] = parquet_file
+
+        os.makedirs(self.path, exist_ok=True)
+        with self.lock:
+            for fname in sorted(tables.keys()):
+                source_file = tables[fname]
+                dbase = 'coreco' if fname.startswith('core') and fname.endswith('co') else 'nccs'
+                stat = os.stat(source_file)
+                source = '{}:{}'.format(stat.st_size, int(stat.st_mtime))
+                if source_file.endswith('.parquet'):
+                    source = 'parquet:' + source
+
+                with contextlib.closing(sqlite3.connect(os.path.join(self.path, dbase+'.db'))) as con:
+                    con.execute('CREATE TABLE IF NOT EXISTS nccs_loaded (name TEXT PRIMARY KEY, source TEXT)')
+                    row = con.execute('SELECT source FROM nccs_loaded WHERE name = ?', (fname,)).fetchone()
+                    if row is not None and row[0] == source:
+                        continue
+
+                    logger.info('    loading {} into SQLite database {}...'.format(os.path.basename(source_file), dbase))
+                    con.execute('DROP TABLE IF EXISTS "{}"'.format(fname))
+                    rows = 0
+                    columns = []
+                    for chunk in self.read_chunks(source_file, chunksize):
+                        chunk.columns = columns = [c.upper() for c in chunk.columns]
+                        for col in columns:
+                            if col in numeric_columns:
+                                chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+                            elif chunk[col].dtype != object: #e.g. numbers read back from the mirror, stored as text as in a CSV file
+                                chunk[col] = chunk[col].astype(object).where(chunk[col].isnull(), chunk[col].astype(str))
+                        chunk.to_sql(fname, con, if_exists='append', index=False)
+                        rows += len(chunk)
+                    if 'EIN' in columns:
+                        con.execute('CREATE INDEX "ix_{0}_EIN" ON "{0}" (EIN)'.format(fname))
+                    con.execute('INSERT OR REPLACE INTO nccs_loaded (name, source) VALUES (?, ?)', (fname, source))
+                    con.commit()
+                    logger.info('        {} rows loaded.'.format(rows))
+
+    def read_chunks(self, source_file, chunksize):
+        """
+        Reads a CSV or Parquet file a chunk of rows at a time, CSV columns as text.
+
+        ARGUMENTS
+        source_file (str) : Location of the file
+        chunksize (int) : Rows per chunk
+
+        RETURNS
+        generator of DataFrame
+        """
+        if source_file.endswith('.parquet'):
+            for batch in pq.ParquetFile(source_file).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            for chunk in pd.read_csv(source_file, dtype='str', chunksize=chunksize, encoding='utf-8'):
+                yield chunk
+
+    def table_columns(self, con, fname, dbase):
+        """
+        Looks up the columns of a table, in table order; an empty list if the table does not exist.
+
+        ARGUMENTS
+        con (SQLiteConnection) : Connection from the connect method
+        fname (str) : Table name
+        dbase (str) : Database name
+
+        RETURNS
+        list
+        """
+        con.select_db(dbase)
+        with con.cursor() as cursor:
+            cursor.execute('SELECT name FROM pragma_table_info(?) ORDER BY cid', (fname,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def table_version(self, con, fname, dbase):
+        """
+        Returns a string that changes whenever the table is reloaded from its CSV file, or None if the table
+        was not loaded by load_folder.
+
+        ARGUMENTS
+        con (SQLiteConnection) : Connection from the connect method
+        fname (str) : Table name
+        dbase (str) : Database name
+
+        RETURNS
+        str or None
+        """
+        con.select_db(dbase)
+        with con.cursor() as cursor:
+            try:
+                cursor.execute('SELECT source FROM nccs_loaded WHERE name = ?', (fname,))
+            except sqlite3.OperationalError: #no tables loaded into this database
+                return None
+            row = cursor.fetchone()
+        return None if row is None else 'sqlite:'+row[0]
+
+    def create_ein_table(self, con, table, eins):
+        """
+        Creates a temporary table of EINs on the connection, for the get_sql semijoin.
+
+        ARGUMENTS
+        con (SQLiteConnection) : Connection from the connect method
+        table (str) : Name of the temporary table
+        eins (list) : The EINs, as strings
+
+        RETURNS
+        None
+        """
+        with con.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+            cursor.execute('CREATE TEMPORARY TABLE {} (EIN VARCHAR(9) PRIMARY KEY)'.format(table))
+            cursor.executemany('INSERT INTO {} (EIN) VALUES (?)'.format(table), [(ein,) for ein in eins])
+
+    def stream_cursor(self, con):
+        """
+        Returns a cursor for fetching rows in chunks; sqlite3 cursors already step through results lazily.
+        """
+        return con.cursor()
+
+    def dbapi_connection(self, con):
+        """
+        Returns the connection to hand to pd.read_sql: the sqlite3 connection for the current database.
+        """
+        return con.current
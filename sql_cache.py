@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+class SQLCache():
+    """
+    Holds the dataframes retrieved by the get_sql method of the LoadData class (NTEE, FIPS/MSA and the
+    prior releases) in memory, within a budget of bytes.  It is used like a dictionary of {key: dataframe}.
+
+    Each dataframe is measured when it is stored, with memory_usage(deep=True).  Once the total is over the
+    budget the least recently used dataframes are evicted.  An evicted table that is already on disk in the
+    "downloads/nccs" folder is simply dropped, since get_sql will load it from there again if it is asked
+    for; anything else (e.g. a prior release filtered to some EINs) is spilled to a pickle file first, and
+    read back from it the next time it is used.
+
+    The hits, misses, evictions, spills and reloads attributes count what the cache has done over the run.
+    """
+    def __init__(self, max_bytes=None, spill_path=None, on_disk=None):
+        self.max_bytes = max_bytes #None for no limit
+        self.spill_path = spill_path
+        self.on_disk = on_disk #function of a key, True if get_sql can load that key from disk without the cache
+        self.entries = OrderedDict() #{key: DataFrame}, least recently used first
+        self.sizes = {} #{key: bytes} for every entry in memory
+        self.spilled = {} #{key: location of the pickle file} for every entry spilled to disk
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+        self.reloads = 0
+
+        if spill_path is not None and os.path.exists(spill_path):
+            for f in os.listdir(spill_path): #left behind by an earlier run that did not finish
+                os.remove(os.path.join(spill_path, f))
+
+    def __contains__(self, key):
+        return key in self.entries or key in self.spilled
+
+    def __len__(self):
+        return len(self.entries) + len(self.spilled)
+
+    def __getitem__(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            elif key in self.spilled:
+                spill_file = self.spilled.pop(key)
+                df = pd.read_pickle(spill_file)
+                os.remove(spill_file)
+                self.hits += 1
+                self.reloads += 1
+                self.add(key, df)
+                return df
+            else:
+                raise KeyError(key)
+
+    def __setitem__(self, key, df):
+        with self.lock:
+            self.misses += 1 #only data that was not already cached is stored
+            self.add(key, df)
+
+    def keys(self):
+        return list(self.entries.keys()) + list(self.spilled.keys())
+
+    def add(self, key, df):
+        """
+        Puts a dataframe in memory as the most recently used entry, then evicts older ones until the cache is
+        back within its budget.  The entry just added is never evicted, even if it alone is over budget.
+
+        ARGUMENTS
+        key (str) : Cache key, from the sql_cache_key method of the LoadData class
+        df (DataFrame) : Data retrieved by get_sql
+
+        RETURNS
+        None
+        """
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.sizes[key]
+            self.entries[key] = df
+            self.entries.move_to_end(key)
+            self.sizes[key] = int(df.memory_usage(index=True, deep=True).sum())
+            self.total_bytes += self.sizes[key]
+            self.evict()
+
+    def evict(self):
+        """
+        Evicts the least recently used dataframes until the total size is within max_bytes.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        with self.lock:
+            while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                key, df = self.entries.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(key)
+                self.evictions += 1
+                if self.spill_path is not None and (self.on_disk is None or not self.on_disk(key)):
+                    os.makedirs(self.spill_path, exist_ok=True)
+                    spill_file = os.path.join(self.spill_path, key+'.pkl')
+                    df.to_pickle(spill_file)
+                    self.spilled[key] = spill_file
+                    self.spills += 1
+
+    def stats(self):
+        """
+        Returns the counters and current size of the cache.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        dict
+        """
+        return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'spills':self.spills,
+                'reloads':self.reloads, 'bytes':self.total_bytes, 'in_memory':len(self.entries), 'spilled':len(self.spilled)}
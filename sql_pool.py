@@ -0,0 +1,97 @@
+import queue
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class SQLPool():
+    """
+    A small pool of connections to the NCCS MySQL server, all opened with the credentials collected by the
+    sql_auth method of the LoadData class.  A pymysql connection can only run one query at a time, so
+    pulling several tables at once (as the prior_year and backfill methods do) needs one connection each.
+
+    Connections are only opened as they are needed, up to the size of the pool, and are kept open for reuse
+    until the close method is called.  The connection made in sql_auth is the first member of the pool.
+    """
+    def __init__(self, connect, size, first=None):
+        self.connect = connect
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.opened = [] #every connection the pool has handed out, idle or not
+        self.lock = threading.Lock()
+        if first is not None:
+            self.opened.append(first)
+            self.idle.put(first)
+
+    def acquire(self):
+        """
+        Takes an idle connection from the pool, opening a new one if none is idle and the pool is not yet
+        full; otherwise waits for one to be released.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        Connection
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if len(self.opened) < self.size:
+                con = self.connect()
+                self.opened.append(con)
+                return con
+        return self.idle.get()
+
+    def release(self, con):
+        """
+        Returns a connection taken with the acquire method to the pool.
+        """
+        self.idle.put(con)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Context manager that holds one connection from the pool for the length of the with block.
+        """
+        con = self.acquire()
+        try:
+            yield con
+        finally:
+            self.release(con)
+
+    def fetch_all(self, jobs):
+        """
+        Runs each job on its own connection from the pool, as many at a time as the pool has connections,
+        and yields the results in whatever order they finish.  Any exception raised by a job is raised here.
+
+        ARGUMENTS
+        jobs (dict) : {name: func}, where each func takes a connection as its only argument
+
+        RETURNS
+        Generator of (str, object) : The name of each job and whatever its func returned
+        """
+        def _run(job):
+            with self.connection() as con:
+                return job(con)
+
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            futures = {pool.submit(_run, job):name for name, job in jobs.items()}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        """
+        Closes every connection the pool has opened.
+
+        ARGUMENTS
+        None
+
+        RETURNS
+        None
+        """
+        with self.lock:
+            for con in self.opened:
+                con.close()
+            self.opened = []
@@ -0,0 +1,47 @@
+import glob
+import logging
+import os
+import re
+import types
+import pandas as pd
+import pytest
+
+import data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _data(**settings):
+    main = types.SimpleNamespace(path=ROOT, forms=['EZ', 'Full'], logger=logging.getLogger('test'))
+    d = data.Data(main, True, False, 2014, 0)
+    for k, v in settings.items():
+        setattr(d, k, v)
+    return d
+
+def test_decode_codes_only_undoes_encoding():
+    pytest.importorskip('pyarrow')
+    d = _data(categorical_codes=True, arrow_strings=True)
+    df = pd.DataFrame({'STATE':['VA', 'MD', 'VA', 'VA'], 'NAME':['A', None, 'C', 'D']}, dtype=object)
+    df['ZIP5'] = pd.Series(['22201', '20001', '22201', '22202'], dtype=pd.StringDtype()) #a string column encoding left alone
+    zip_dtype = df['ZIP5'].dtype
+    d.encode_codes({'EZ':df})
+    d.arrow_text({'EZ':df})
+    assert df['STATE'].dtype.name == 'category'
+    assert df['NAME'].dtype == pd.StringDtype('pyarrow')
+
+    d.decode_codes(df)
+    assert df['STATE'].dtype == object and df['NAME'].dtype == object
+    assert df['ZIP5'].dtype == zip_dtype
+    assert df['STATE'].tolist() == ['VA', 'MD', 'VA', 'VA']
+
+def test_plan_covers_the_columns_the_code_uses():
+    #every known column named in the process, validate and write steps (equations, fixer groups, criteria) must be read
+    d = _data()
+    known = set(d.numeric_columns + d.code_columns + d.text_columns)
+    for form in ['ez', 'full', 'pf']:
+        known.update(d.load_crosswalk(form).values())
+    modules = glob.glob(os.path.join(ROOT, 'process*.py')) + glob.glob(os.path.join(ROOT, 'validat*.py')) + [os.path.join(ROOT, 'write.py')]
+    used = set()
+    for module in modules:
+        with open(module, 'r') as f:
+            used.update(re.findall(r"""['"]([A-Z][A-Z0-9_]*)['"]""", f.read()))
+    assert sorted(used.intersection(known).difference(d.plan_columns())) == []
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import types
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+import data
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    Serves the files in a folder as the IRS server does, with ETag and Last-Modified headers, If-None-Match,
+    and Range requests honored only while If-Range matches the current ETag.
+    """
+    root = None
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with open(os.path.join(self.root, self.path.lstrip('/')), 'rb') as f:
+            body = f.read()
+        etag = _etag(body)
+        self.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range') in [None, etag]:
+            start = int(re.match(r'bytes=(\d+)-', byte_range).group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(body)-1, len(body)))
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def server(tmp_path):
+    www = tmp_path / 'www'
+    www.mkdir()
+    StandIn.root = str(www)
+    StandIn.requests = []
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield www, 'http://127.0.0.1:{}/'.format(srv.server_address[1])
+    srv.shutdown()
+
+@pytest.fixture
+def loader(tmp_path):
+    (tmp_path / 'downloads').mkdir()
+    main = types.SimpleNamespace(path=str(tmp_path), force_new_download=False, logger=logging.getLogger('test'), forms=[])
+    d = data.Data(main, True, False, 2014, 0)
+    d.download_chunk_size = 1000
+    return d
+
+def _download(loader, server, name, body):
+    www, base = server
+    (www / name).write_bytes(body)
+    output_file = os.path.join(loader.main.path, loader.irs_download_folder, name)
+    loader.stream_file(base + name, output_file)
+    with open(output_file, 'rb') as f:
+        return f.read()
+
+def _etag(body):
+    return '"{}"'.format(hashlib.md5(body).hexdigest())
+
+def _interrupt(loader, server, name, body, size):
+    #leaves the .part of an earlier run that stopped after size bytes, or that holds size bytes of junk
+    _download(loader, server, name, body)
+    output_file = os.path.join(loader.main.path, loader.irs_download_folder, name)
+    os.chmod(output_file, 0o644)
+    os.rename(output_file, output_file + '.part')
+    with open(output_file + '.part', 'r+b') as f:
+        f.truncate(size)
+    with open(output_file + '.part.json', 'w') as f:
+        json.dump({'etag':_etag(body), 'last_modified':None}, f)
+    StandIn.requests = []
+
+def test_resume_requests_only_the_rest(loader, server):
+    body = os.urandom(10000)
+    _interrupt(loader, server, 'eo1.csv', body, 4000)
+    assert _download(loader, server, 'eo1.csv', body) == body
+    assert StandIn.requests[0]['Range'] == 'bytes=4000-'
+    assert StandIn.requests[0]['If-Range'] == _etag(body)
+
+def test_unsatisfiable_range_restarts(loader, server):
+    body = os.urandom(10000)
+    _interrupt(loader, server, 'eo2.csv', body, 12000)
+    assert _download(loader, server, 'eo2.csv', body) == body
+    assert 'Range' in StandIn.requests[0] and 'Range' not in StandIn.requests[1]
+
+def test_changed_file_is_not_spliced(loader, server):
+    old, new = os.urandom(10000), os.urandom(12000)
+    _interrupt(loader, server, 'eo3.csv', old, 4000)
+    assert _download(loader, server, 'eo3.csv', new) == new
+    assert StandIn.requests[0]['If-Range'] == _etag(old) and len(StandIn.requests) == 1
@@ -0,0 +1,30 @@
+import io
+import logging
+import types
+import pandas as pd
+import pytest
+
+import data
+
+pytest.importorskip('pyarrow')
+
+#a header line, then rows with a leading-zero EIN, an all-empty column, a number column holding an 'N', and dates
+CORE = (b'EIN NAME EMPTY TOTREV MIX DATE FLAG\n'
+        b'010000001 A  100 1 2015-01-01 True\n'
+        b'010000002 B  N 2 2015-02-01 False\n'
+        b'010000003 NA  300.5 x 2015-03-01 True\n')
+
+def _read(engine, **kwargs):
+    main = types.SimpleNamespace(path='.', force_new_download=False, logger=logging.getLogger('test'), forms=[])
+    d = data.Data(main, True, False, 2014, 0)
+    d.parser_engine = engine
+    f = io.BytesIO(CORE)
+    names = pd.read_csv(io.BytesIO(f.readline()), sep=' ', nrows=0).columns.tolist()
+    return d.read_csv(f, sep=' ', names=names, dtype={'EIN':'str', 'NAME':'str'}, low_memory=False, **kwargs)
+
+def test_engines_agree():
+    c, p = _read('c'), _read('pyarrow')
+    assert c.dtypes.tolist() == p.dtypes.tolist()
+    pd.testing.assert_frame_equal(c, p)
+    assert p['EIN'].tolist()[0] == '010000001'
+    assert p['EMPTY'].dtype == 'float64'
@@ -0,0 +1,46 @@
+import logging
+import types
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('dask') #process.py, which write.py inherits from, needs it
+import data
+import write
+
+def _main(tmp_path, **settings):
+    main = types.SimpleNamespace(path=str(tmp_path), forms=['EZ', 'Full'], logger=logging.getLogger('test'))
+    main.data = data.Data(None, True, False, 2014, 0)
+    main.data.main = main
+    for k, v in settings.items():
+        setattr(main.data, k, v)
+    ez = pd.DataFrame({'SUBSECCD':['03', '04', '03'], 'NAME':['A', 'B', 'C'], 'TOTREV':[1.0, np.nan, 3.0], 'STATE':['VA', 'MD', 'VA']},
+                      index=pd.Index([1, 2, 3], name='EIN'))
+    full = pd.DataFrame({'SUBSECCD':['03', '05'], 'NAME':['D', 'E'], 'TOTREV':[4.0, 0.0], 'EXPS':[0.0, 5.0], 'STATE':['DC', 'VA'],
+                         'SEC_NAME':['F', None]},
+                        index=pd.Index([4, 5], name='EIN'))
+    main.data_dict = {'EZ':ez, 'Full':full}
+    main.write = write.Write(main, False)
+    main.data.arrow_text(main.data_dict)
+    return main
+
+@pytest.mark.parametrize('settings', [{'categorical_codes':False, 'sparse_density':None, 'arrow_strings':False},
+                                      {'categorical_codes':True, 'sparse_density':0.5, 'arrow_strings':True}])
+def test_build_output_fills_concatenated_ez_and_full(tmp_path, settings):
+    main = _main(tmp_path, **settings)
+    if main.data.sparse_density is not None:
+        main.data.sparsify(main.data_dict)
+    main.write.build_output()
+
+    pc = main.data.densify(main.write.data_dict['PC'].copy())
+    co = main.data.densify(main.write.data_dict['CO'].copy())
+    assert list(pc.index) == [1, 3, 4]
+    assert list(co.index) == [2, 5]
+    assert pc['EXPS'].tolist() == [0.0, 0.0, 0.0]
+    assert co['TOTREV'].tolist() == [0.0, 0.0]
+    assert co['EXPS'].tolist() == [0.0, 5.0]
+    assert pc['NAME'].astype(object).tolist() == ['A', 'C', 'D']
+    assert pc['SEC_NAME'].astype(object).tolist() == ['', '', 'F']
+    assert co['SEC_NAME'].astype(object).tolist() == ['', '']
+    if main.data.arrow_strings:
+        assert pc['SEC_NAME'].dtype == pd.StringDtype('pyarrow')
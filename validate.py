@@ -8,6 +8,7 @@ from validate_pf import *
 import datetime
 import logging
 import pandas as pd
+from ein import ein_to_str, convert_eins
 
 # Code by Jeff Levy (jlevy@urban.org), 2016-2017
 
@@ -73,10 +74,12 @@ class Validate(ValidateEZ, ValidateFull, ValidatePF):
             df.rename(columns={'level_0':self.validation_reason}, inplace=True)
             assert(df.index.dtype.type is np.object_), 'Third'
             df = df.reset_index().groupby('EIN').head(1)
-            assert(df['EIN'].dtype.type is np.object_), 'Fourth'
+            assert(df['EIN'].dtype.type is np.int64), 'Fourth'
             df.drop('level_0', axis=1, inplace=True)
+            df['EIN'] = ein_to_str(df['EIN']) #written out zero-padded to 9 characters, as in the final output
             df.set_index('EIN', inplace=True)
             assert(df.index.dtype.type is np.object_), 'Fifth'
+            df = main.data.densify(df)
 
             df.to_csv(os.path.join(main.path, self.validate_folder, '{}_{}_validate.csv'.format(form.lower(), main.data.core_file_year)))
 
@@ -201,6 +204,22 @@ class Validate(ValidateEZ, ValidateFull, ValidatePF):
 
         main.logger.info('Finished extracting additional validation data.\n')
 
+    def dense(self, col):
+        """
+        Returns the result of a validation equation as a dense series.  Equations over sparse columns (see the
+        sparsify method of the Data class) give sparse results, and pandas turns a sparse series with no
+        non-zero values into all NaN when it is aligned to the rows of the whole form.
+
+        ARGUMENTS
+        col (Series) : Result of one of the validation equations
+
+        RETURNS
+        Series
+        """
+        if isinstance(col.dtype, pd.SparseDtype):
+            col = col.sparse.to_dense()
+        return col
+
     def validate(self, df, failed_validation, col_name, form, sub_form):
         """
         Method used on a per-column basis to see if there are any validation failures.  This is called from
@@ -303,6 +322,7 @@ class Validate(ValidateEZ, ValidateFull, ValidatePF):
                 continue
 
             # fixes_df = fixes_df[~fixes_df['SOURCE'].isin(['14eofinextract990.zip', '13eofinextract990.zip', '15eofinextract990.dat.dat'])] #TEMP FOR 2014/2015 due to backfill process change
+            fixes_df = convert_eins(fixes_df, main.logger, 'the {} validation fixes'.format(form))
             fixes_df.set_index('EIN', inplace=True)
             #recast required str columns in fixed dataframe as numeric
             num_cols = [c for c in main.data.numeric_columns if c in fixes_df.columns]
@@ -312,10 +332,15 @@ class Validate(ValidateEZ, ValidateFull, ValidatePF):
             drop_cols = [c for c in fixes_df.columns if c.startswith('validate_')]#+[self.manual_fix_column_name]
             fixes_df.drop(drop_cols, axis=1, inplace=True) #separates the manual fixes column from the data
             fixes_df = fixes_df.loc[[i for i in fixes_df.index if i in main.write.data_dict[form].index]] #make sure only EINs that are in both dfs are merged - should be redundant
+            main.data.decode_codes(main.write.data_dict[form]) #fixed values may be codes not seen before
+            main.data.densify(main.write.data_dict[form]) #sparse columns can't be assigned rows
             main.write.data_dict[form].loc[fixes_df.index] = fixes_df
 
             log_str = 'Integrated {} rows of manually fixed EINs from "{}" folder into form {}'.format(len(fixes_df),self.validate_fixes, form)
             main.logger.info(log_str)
 
+        main.data.encode_codes(main.write.data_dict)
+        main.data.sparsify(main.write.data_dict)
+        main.data.arrow_text(main.write.data_dict)
         self.integrated_fixes = True
         main.logger.info('Integration of manual fixes completed, continuing with validation...\n')
@@ -38,22 +38,22 @@ class ValidateEZ():
 
                 ez_failed_validation = self.validation_tracking[form]
 
-                df['validate_ez_saleothn'] = self.ez_validate_saleothn(df).loc[ezonly.index]
+                df['validate_ez_saleothn'] = self.dense(self.ez_validate_saleothn(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_saleothn', form, sub_form)
 
-                df['validate_ez_netincfndrsng'] = self.ez_validate_netincfndrsng(df).loc[ezonly.index]
+                df['validate_ez_netincfndrsng'] = self.dense(self.ez_validate_netincfndrsng(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_netincfndrsng', form, sub_form)
 
-                df['validate_ez_grprof'] = self.ez_validate_grprof(df).loc[ezonly.index]
+                df['validate_ez_grprof'] = self.dense(self.ez_validate_grprof(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_grprof', form, sub_form)
 
-                df['validate_ez_totrev'] = self.ez_validate_totrev(df).loc[ezonly.index]
+                df['validate_ez_totrev'] = self.dense(self.ez_validate_totrev(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_totrev', form, sub_form)
 
-                df['validate_ez_netinc'] = self.ez_validate_netinc(df).loc[ezonly.index]
+                df['validate_ez_netinc'] = self.dense(self.ez_validate_netinc(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_netinc', form, sub_form)
 
-                df['validate_ez_ass_eoy'] = self.ez_validate_ass_eoy(df).loc[ezonly.index]
+                df['validate_ez_ass_eoy'] = self.dense(self.ez_validate_ass_eoy(df)).loc[ezonly.index]
                 df, ez_failed_validation = self.validate(df, ez_failed_validation, 'validate_ez_ass_eoy', form, sub_form)
 
                 self.validation_tracking[form] = ez_failed_validation
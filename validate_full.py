@@ -41,31 +41,31 @@ class ValidateFull():
                 # df['validate_fu_exps'] = self.full_validate_exps(df).ix[fullonly.index]
                 # df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_exps', form, sub_form)
 
-                df['validate_fu_netrent'] = self.full_validate_netrent(df).loc[fullonly.index]
+                df['validate_fu_netrent'] = self.dense(self.full_validate_netrent(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_netrent', form, sub_form)
 
-                df['validate_fu_netgnls'] = self.full_validate_netgnls(df).loc[fullonly.index]
+                df['validate_fu_netgnls'] = self.dense(self.full_validate_netgnls(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_netgnls', form, sub_form)
 
-                df['validate_fu_netincfndrsng'] = self.full_validate_netincfndrsng(df).loc[fullonly.index]
+                df['validate_fu_netincfndrsng'] = self.dense(self.full_validate_netincfndrsng(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_netincfndrsng', form, sub_form)
 
-                df['validate_fu_netincgaming'] = self.full_validate_netincgaming(df).loc[fullonly.index]
+                df['validate_fu_netincgaming'] = self.dense(self.full_validate_netincgaming(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_netincgaming', form, sub_form)
 
-                df['validate_fu_grprof'] = self.full_validate_grprof(df).loc[fullonly.index]
+                df['validate_fu_grprof'] = self.dense(self.full_validate_grprof(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_grprof', form, sub_form)
 
                 # df['validate_fu_othinc'] = self.full_validate_othinc(df).ix[fullonly.index]
                 # df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_othinc', form, sub_form)
 
-                df['validate_fu_totrev2'] = self.full_validate_totrev2(df).loc[fullonly.index]
+                df['validate_fu_totrev2'] = self.dense(self.full_validate_totrev2(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_totrev2', form, sub_form)
 
                 # df['validate_fu_progrev'] = self.full_validate_progrev(df).ix[fullonly.index]
                 # df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_progrev', form, sub_form)
 
-                df['validate_fu_fundbal'] = self.full_validate_fundbal(df).loc[fullonly.index]
+                df['validate_fu_fundbal'] = self.dense(self.full_validate_fundbal(df)).loc[fullonly.index]
                 df, full_failed_validation = self.validate(df, full_failed_validation, 'validate_fu_fundbal', form, sub_form)
 
                 # df['validate_fu_ass_eoy'] = self.full_validate_ass_eoy(df).ix[fullonly.index]
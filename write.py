@@ -5,6 +5,7 @@ import numpy as np
 import os
 import logging
 from process_co_pc import pc_dup_criteria, co_dup_criteria
+from ein import ein_to_str
 
 # Code by Jeff Levy (jlevy@urban.org), 2016-2017
 
@@ -39,6 +40,10 @@ class Write(Deduplicate):
         main = self.main
         forms = main.forms
 
+        #code columns are categorical from here on, with the same categories in every form
+        main.data.encode_codes(main.data_dict)
+        main.data.arrow_text(main.data_dict) #adds the columns calculated since make_numeric, e.g. NCCSKEY
+
         if 'PF' in forms:
             # If PF is found in the forms, then it creates the PF file - currently this is just a
             # pointer, because there is no additional merging or processing.
@@ -58,10 +63,15 @@ class Write(Deduplicate):
 
             def _na_fill(df):
                 #for fixing NaNs created by concatenting EZ entries with Full
-                num_cols = df.select_dtypes(include=[np.number]).columns.values
-                str_cols = df.select_dtypes(include=[np.object_]).columns.values
-                df.loc[:, num_cols] = df.loc[:, num_cols].fillna(0)
-                df.loc[:, str_cols] = df.loc[:, str_cols].fillna('')
+                num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+                str_cols = df.select_dtypes(include=[np.object_, 'string']).columns.tolist() #'string' includes pandas 3's str and the Arrow-backed strings of arrow_text
+                df[num_cols] = df[num_cols].fillna(0) #replaces the columns, since sparse ones can't be filled in place
+                df[str_cols] = df[str_cols].fillna('')
+                for col in df.select_dtypes(include=['category']).columns.values:
+                    if df[col].isnull().any():
+                        if '' not in df[col].cat.categories:
+                            df[col] = df[col].cat.add_categories([''])
+                        df[col] = df[col].fillna('')
                 return df
 
             main.logger.info('Building PC file from Full and EZ source.')
@@ -83,6 +93,9 @@ class Write(Deduplicate):
         if 'EZ' in forms and 'Full' not in forms:
             raise Exception('Including IRS form 990EZ, but not IRS form 990 full, is not enough to create either the CO or PC files.')
 
+        main.data.encode_codes(self.data_dict)
+        main.data.arrow_text(self.data_dict)
+
         main.logger.info('Finished building final output.\n')
 
     def handle_duplicates(self):
@@ -134,7 +147,10 @@ class Write(Deduplicate):
                     name = form.lower() + '990'
                 else:
                     name = form.lower()
-                self.data_dict[form].to_csv(os.path.join(self.output_folder, 'core{}{}.csv'.format(y, name)))
+                #EINs are int64 in the index, and are written out zero-padded to 9 characters
+                df = main.data.densify(self.data_dict[form].copy(deep=False))
+                df.index = pd.Index(ein_to_str(df.index), name=df.index.name)
+                df.to_csv(os.path.join(self.output_folder, 'core{}{}.csv'.format(y, name)))
                 main.logger.info('Completed form {} written to {}'.format(form, self.output_folder + os.sep))
             main.logger.info('All dataframes written to file.\n')
         else: